@@ -1,10 +1,12 @@
 """FastAPI app initialization and routing."""
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .config.settings import ALL_ALLOWED_ORIGINS, ANTHROPIC_API_KEY
-from .services.anthropic import AnthropicService
+from .services.anthropic import AnthropicService, close_shared_client
 from .services.mindmap import MindMapService
 from .services.question import QuestionService
 from .services.session import SessionService
@@ -20,9 +22,20 @@ logger = logging.getLogger(__name__)
 _services = None
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release shared resources when the application shuts down."""
+    yield
+    await close_shared_client()
+
+
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
-    app = FastAPI(title="Mind Map Learning API")
+    app = FastAPI(
+        title="Mind Map Learning API",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
+    )
     
     # Configure CORS for frontend communication
     app.add_middleware(
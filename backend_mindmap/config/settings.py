@@ -20,6 +20,14 @@ if not ANTHROPIC_API_KEY:
 CLAUDE_LATEST = "claude-3-7-sonnet-20250219"
 CLAUDE_BACKUP = "claude-3-sonnet-20240229"
 
+# Connection pool limits for the shared Anthropic HTTP client
+ANTHROPIC_MAX_CONNECTIONS = 100
+ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = 50
+
+# Retries for rate-limited (429) and server (5xx) errors; the SDK backs off
+# exponentially with jitter and honours retry-after headers
+ANTHROPIC_MAX_RETRIES = 3
+
 # API and CORS settings
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 DEFAULT_ALLOWED_ORIGINS = ["http://localhost:3000", "http://localhost:8000", "http://localhost:5173"]
@@ -34,4 +42,24 @@ if "*" in ALLOWED_ORIGINS:
 
 # Default settings for mindmap generation
 DEFAULT_MAX_DEPTH = 3
-DEFAULT_MAX_CHILDREN = 4 
\ No newline at end of file
+DEFAULT_MAX_CHILDREN = 4 
+
+# Maximum number of concurrent Claude calls while generating a mindmap level
+MAX_CONCURRENT_GENERATIONS = 10
+
+# Number of sibling parents expanded by a single Claude call; adapted at runtime
+# between 1 and MAX_PARENTS_PER_REQUEST based on how packed calls perform
+PARENTS_PER_REQUEST = 5
+MAX_PARENTS_PER_REQUEST = 8
+
+# Packed calls slower than this shrink the number of parents per request
+PACKED_REQUEST_TARGET_SECONDS = 8.0
+
+# Maximum number of cached generation results (child nodes, questions) kept per service
+GENERATION_CACHE_MAX_ENTRIES = 1024
+
+# Approximate token budget for node content embedded in generation prompts
+PROMPT_CONTENT_TOKEN_BUDGET = 400
+
+# Maximum number of sessions kept in memory; the least recently used session is evicted
+MAX_SESSIONS = 1000
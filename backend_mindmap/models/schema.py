@@ -1,7 +1,8 @@
 """Pydantic models for the backend."""
+from collections import defaultdict
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Set, Any, Union
-from datetime import datetime
+from typing import DefaultDict, Dict, List, Optional, Set, Any, Union
+from datetime import datetime, timezone
 import uuid
 
 
@@ -14,7 +15,7 @@ class Question(BaseModel):
     status: str = "not_attempted"
     attempts: int = 0
     last_answer: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = None
 
 
@@ -23,6 +24,8 @@ class NodeStatus(BaseModel):
     node_id: str
     status: str = "locked"  # locked, not_started, in_progress, completed
     questions: List[Question] = []
+    questions_by_id: Dict[str, Question] = Field(default_factory=dict, exclude=True)
+    passed_count: int = Field(default=0, exclude=True)
     unlockable: bool = False
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
@@ -42,6 +45,11 @@ class NodeInfo(BaseModel):
     position: Optional[Dict[str, float]] = None
     type: str = "mindmap"
 
+    @property
+    def content_preview(self) -> str:
+        """Short preview of the content used as context for related nodes."""
+        return self.content[:200]
+
 
 class EdgeInfo(BaseModel):
     """Model representing an edge in the graph."""
@@ -53,8 +61,8 @@ class EdgeInfo(BaseModel):
 
 class NodeRelationships(BaseModel):
     """Model representing the relationships between nodes."""
-    parents: Dict[str, Set[str]] = {}
-    children: Dict[str, Set[str]] = {}
+    parents: DefaultDict[str, Set[str]] = Field(default_factory=lambda: defaultdict(set))
+    children: DefaultDict[str, Set[str]] = Field(default_factory=lambda: defaultdict(set))
 
 
 class SessionData(BaseModel):
@@ -62,6 +70,7 @@ class SessionData(BaseModel):
     nodes: Dict[str, NodeStatus] = {}
     graph_nodes: Dict[str, NodeInfo] = {}
     graph_edges: List[EdgeInfo] = []
+    graph_edge_ids: Set[str] = Field(default_factory=set, exclude=True)
     relationships: NodeRelationships = Field(default_factory=NodeRelationships)
     chat_history: Optional[Dict[str, Any]] = {}
 
@@ -74,6 +83,29 @@ class MindMapNode(BaseModel):
     parent_id: Optional[str] = None
 
 
+class GeneratedNodeData(BaseModel):
+    """Model for a node returned by Claude's mindmap tools; any field may be missing."""
+    id: Optional[str] = None
+    label: Optional[str] = None
+    content: Optional[str] = None
+
+
+class GeneratedNodesPayload(BaseModel):
+    """Model for create_mindmap and create_child_nodes tool output."""
+    nodes: List[GeneratedNodeData] = []
+
+
+class GeneratedParentChildren(BaseModel):
+    """Model for one parent's entry in create_children_for_parents tool output."""
+    parent_id: Optional[str] = None
+    children: List[GeneratedNodeData] = []
+
+
+class GeneratedChildrenPayload(BaseModel):
+    """Model for create_children_for_parents tool output."""
+    parents: List[GeneratedParentChildren] = []
+
+
 class GeneratedMindMap(BaseModel):
     """Model representing a generated mindmap."""
     nodes: List[MindMapNode]
@@ -84,7 +116,7 @@ class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     role: str
     content: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 # Request and Response Models
@@ -105,6 +137,21 @@ class GenerateQuestionsRequest(BaseModel):
     child_nodes: List[Dict[str, str]] = []
 
 
+class QuestionNodeData(BaseModel):
+    """Node details for generating questions as part of a batch."""
+    node_id: str
+    node_label: str
+    node_content: str
+    parent_nodes: List[Dict[str, str]] = []
+    child_nodes: List[Dict[str, str]] = []
+
+
+class BatchGenerateQuestionsRequest(BaseModel):
+    """Request model for generating questions for several nodes at once."""
+    session_id: str
+    nodes: List[QuestionNodeData]
+
+
 class AnswerRequest(BaseModel):
     """Request model for submitting an answer."""
     session_id: str
@@ -119,6 +166,12 @@ class UnlockCheckRequest(BaseModel):
     node_id: str
 
 
+class BatchUnlockCheckRequest(BaseModel):
+    """Request model for checking if several nodes are unlockable."""
+    session_id: str
+    node_ids: List[str]
+
+
 class CreateMindMapRequest(BaseModel):
     """Request model for creating a mindmap."""
     session_id: str
@@ -133,6 +186,12 @@ class UpdateNodeStatusRequest(BaseModel):
     status: str
 
 
+class BulkUpdateNodeStatusRequest(BaseModel):
+    """Request model for updating several nodes' statuses."""
+    session_id: str
+    statuses: Dict[str, str]
+
+
 class GenerateChildNodesRequest(BaseModel):
     """Request model for generating child nodes."""
     session_id: str
@@ -1,11 +1,13 @@
 """Chat-related API routes."""
 import logging
+import orjson
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, List
-from datetime import datetime
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Tuple
+from datetime import datetime, timezone
 
-from ..models.schema import ChatMessageRequest, ChatResponse, ChatMessage
+from ..models.schema import ChatMessageRequest, ChatResponse, ChatMessage, NodeInfo, SessionData
 from ..services.chat import ChatService
 from ..services.session import SessionService
 
@@ -33,6 +35,105 @@ def get_session_service():
     return services["session"]
 
 
+def _stored_message(msg: Dict[str, Any], now: datetime) -> ChatMessage:
+    """
+    Rebuild a ChatMessage from a stored chat history entry.
+    
+    Args:
+        msg: Stored message dictionary
+        now: Timestamp to use when the message has none
+        
+    Returns:
+        The ChatMessage object
+    """
+    # Only generate an id for messages stored without one
+    return ChatMessage(
+        id=msg.get("id") or str(uuid.uuid4()),
+        role=msg["role"],
+        content=msg["content"],
+        created_at=msg.get("created_at") or now
+    )
+
+
+def _get_related_nodes(session_data: SessionData, node_id: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Collect parent and child node context for a node's chat."""
+    graph_nodes = session_data.graph_nodes
+    
+    def context_for(related_ids) -> List[Dict[str, str]]:
+        related = (graph_nodes.get(related_id) for related_id in related_ids)
+        return [{"label": node.label, "content_preview": node.content_preview} for node in related if node is not None]
+    
+    try:
+        relationships = session_data.relationships
+        return (
+            context_for(relationships.parents.get(node_id, ())),
+            context_for(relationships.children.get(node_id, ()))
+        )
+    except Exception as rel_error:
+        logger.warning(f"Error accessing relationships for node {node_id}: {str(rel_error)}")
+        # Continue without relationship data
+        return [], []
+
+
+async def _start_chat_turn(
+    session_service: SessionService,
+    session_id: str,
+    node_id: str,
+    message: str,
+    now: datetime
+) -> Tuple[NodeInfo, Dict[str, Any], List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Load a node's chat and append the user's message to its history.
+    
+    Args:
+        session_service: The session service
+        session_id: The session identifier
+        node_id: The node identifier
+        message: The user's message
+        now: Timestamp for the user's message
+        
+    Returns:
+        Tuple of the node info, the chat history, the message history for Claude,
+        and the parent and child node context
+        
+    Raises:
+        HTTPException: If the node is not in the session
+    """
+    # Get session data
+    session_data = await session_service.get_session_data(session_id)
+    
+    # Check if node exists
+    if node_id not in session_data.graph_nodes:
+        raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
+    
+    # Get node information
+    node_info = session_data.graph_nodes[node_id]
+    
+    # Get existing chat history
+    chat_history = await session_service.storage.get_chat_history(session_id, node_id)
+    
+    # Add user message to chat history
+    user_message = ChatMessage(
+        id=str(uuid.uuid4()),
+        role="user",
+        content=message,
+        created_at=now
+    )
+    
+    if "messages" not in chat_history:
+        chat_history["messages"] = []
+        
+    chat_history["messages"].append(user_message.dict())
+    
+    # Get related nodes for context
+    parent_nodes, child_nodes = _get_related_nodes(session_data, node_id)
+    
+    # Format message history for Claude
+    message_history = [{"role": msg["role"], "content": msg["content"]} for msg in chat_history["messages"]]
+    
+    return node_info, chat_history, message_history, parent_nodes, child_nodes
+
+
 @router.get("/{node_id}")
 async def get_node_chat(
     node_id: str,
@@ -41,6 +142,7 @@ async def get_node_chat(
     session_service: SessionService = Depends(get_session_service)
 ) -> ChatResponse:
     """Get the chat history for a specific node."""
+    now = datetime.now(timezone.utc)
     try:
         logger.info(f"Getting chat history for node: {node_id} in session: {session_id}")
         
@@ -67,22 +169,18 @@ async def get_node_chat(
             await session_service.storage.update_chat_history(session_id, node_id, chat_history)
         else:
             # Convert the messages to ChatMessage objects
-            messages = [
-                ChatMessage(
-                    id=msg.get("id", str(uuid.uuid4())),
-                    role=msg["role"],
-                    content=msg["content"],
-                    created_at=msg.get("created_at", datetime.utcnow())
-                ) for msg in chat_history.get("messages", [])
-            ]
+            messages = [_stored_message(msg, now) for msg in chat_history.get("messages", [])]
         
         return ChatResponse(
             node_id=node_id,
             messages=messages
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting chat history: {str(e)}", exc_info=True)
+        logger.error(f"Error getting chat history: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get chat history: {str(e)}")
 
 
@@ -94,72 +192,15 @@ async def send_chat_message(
     session_service: SessionService = Depends(get_session_service)
 ) -> ChatResponse:
     """Send a message in the chat for a specific node and get a response."""
+    now = datetime.now(timezone.utc)
     try:
         logger.info(f"Sending chat message for node: {node_id}")
         
-        # Get session data
         session_id = request.session_id
-        session_data = await session_service.get_session_data(session_id)
-        
-        # Check if node exists
-        if node_id not in session_data.graph_nodes:
-            raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
-        
-        # Get node information
-        node_info = session_data.graph_nodes[node_id]
-        
-        # Get existing chat history
-        chat_history = await session_service.storage.get_chat_history(session_id, node_id)
-        
-        # Add user message to chat history
-        user_message = ChatMessage(
-            id=str(uuid.uuid4()),
-            role="user",
-            content=request.message,
-            created_at=datetime.utcnow()
+        node_info, chat_history, message_history, parent_nodes, child_nodes = await _start_chat_turn(
+            session_service, session_id, node_id, request.message, now
         )
         
-        if "messages" not in chat_history:
-            chat_history["messages"] = []
-            
-        chat_history["messages"].append(user_message.dict())
-        
-        # Get related nodes for context
-        parent_nodes = []
-        child_nodes = []
-        
-        try:
-            # Get parent nodes
-            if hasattr(session_data, 'relationships'):
-                if hasattr(session_data.relationships, 'parents') and node_id in session_data.relationships.parents:
-                    parent_ids = session_data.relationships.parents[node_id]
-                    for parent_id in parent_ids:
-                        if parent_id in session_data.graph_nodes:
-                            parent = session_data.graph_nodes[parent_id]
-                            parent_nodes.append({
-                                "label": parent.label,
-                                "content": parent.content
-                            })
-            
-                # Get child nodes
-                if hasattr(session_data.relationships, 'children') and node_id in session_data.relationships.children:
-                    child_ids = session_data.relationships.children[node_id]
-                    for child_id in child_ids:
-                        if child_id in session_data.graph_nodes:
-                            child = session_data.graph_nodes[child_id]
-                            child_nodes.append({
-                                "label": child.label,
-                                "content": child.content
-                            })
-        except Exception as rel_error:
-            logger.warning(f"Error accessing relationships for node {node_id}: {str(rel_error)}")
-            # Continue without relationship data
-        
-        # Format message history for Claude
-        message_history = []
-        for msg in chat_history["messages"]:
-            message_history.append({"role": msg["role"], "content": msg["content"]})
-        
         # Generate AI response
         try:
             response_text = await chat_service.generate_chat_response(
@@ -170,47 +211,105 @@ async def send_chat_message(
             )
             
             # Add assistant response to chat history
+            responded_at = datetime.now(timezone.utc)
             assistant_message = ChatMessage(
                 id=str(uuid.uuid4()),
                 role="assistant",
                 content=response_text,
-                created_at=datetime.utcnow()
+                created_at=responded_at
             )
             
             chat_history["messages"].append(assistant_message.dict())
             
         except Exception as chat_error:
-            logger.error(f"Error generating chat response: {str(chat_error)}", exc_info=True)
+            logger.error(f"Error generating chat response: {str(chat_error)}")
+            logger.debug("Traceback:", exc_info=True)
             # Add a fallback message
+            responded_at = datetime.now(timezone.utc)
             assistant_message = ChatMessage(
                 id=str(uuid.uuid4()),
                 role="assistant",
                 content="I'm sorry, I encountered an error while processing your message. Please try again.",
-                created_at=datetime.utcnow()
+                created_at=responded_at
             )
             chat_history["messages"].append(assistant_message.dict())
         
         # Update the chat history's updated_at timestamp
-        chat_history["updated_at"] = datetime.utcnow().isoformat()
+        chat_history["updated_at"] = responded_at.isoformat()
         
         # Save the updated chat history
         await session_service.storage.update_chat_history(session_id, node_id, chat_history)
         
         # Convert messages for response
-        messages = [
-            ChatMessage(
-                id=msg.get("id", str(uuid.uuid4())),
-                role=msg["role"],
-                content=msg["content"],
-                created_at=msg.get("created_at", datetime.utcnow()) if isinstance(msg.get("created_at"), datetime) else datetime.fromisoformat(msg.get("created_at")) if isinstance(msg.get("created_at"), str) else datetime.utcnow()
-            ) for msg in chat_history["messages"]
-        ]
+        messages = [_stored_message(msg, now) for msg in chat_history["messages"]]
         
         return ChatResponse(
             node_id=node_id,
             messages=messages
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error sending chat message: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to send chat message: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error sending chat message: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to send chat message: {str(e)}") 
+
+
+@router.post("/{node_id}/stream")
+async def stream_chat_message(
+    node_id: str,
+    request: ChatMessageRequest,
+    chat_service: ChatService = Depends(get_chat_service),
+    session_service: SessionService = Depends(get_session_service)
+) -> StreamingResponse:
+    """Send a message in the chat for a specific node and stream the response as server-sent events."""
+    now = datetime.now(timezone.utc)
+    try:
+        logger.info(f"Streaming chat message for node: {node_id}")
+        
+        session_id = request.session_id
+        node_info, chat_history, message_history, parent_nodes, child_nodes = await _start_chat_turn(
+            session_service, session_id, node_id, request.message, now
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming chat message: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to stream chat message: {str(e)}")
+    
+    async def event_stream():
+        chunks = []
+        try:
+            async for text in chat_service.generate_chat_response_stream(
+                node_info,
+                message_history,
+                parent_nodes,
+                child_nodes
+            ):
+                chunks.append(text)
+                yield b"data: " + orjson.dumps(text) + b"\n\n"
+        except Exception as chat_error:
+            logger.error(f"Error streaming chat response: {str(chat_error)}")
+            logger.debug("Traceback:", exc_info=True)
+            if not chunks:
+                chunks.append("I'm sorry, I encountered an error while processing your message. Please try again.")
+                yield b"data: " + orjson.dumps(chunks[0]) + b"\n\n"
+        
+        # Persist the full assistant response once streaming is done
+        responded_at = datetime.now(timezone.utc)
+        assistant_message = ChatMessage(
+            id=str(uuid.uuid4()),
+            role="assistant",
+            content="".join(chunks),
+            created_at=responded_at
+        )
+        chat_history["messages"].append(assistant_message.dict())
+        chat_history["updated_at"] = responded_at.isoformat()
+        await session_service.storage.update_chat_history(session_id, node_id, chat_history)
+        
+        yield b"data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -1,11 +1,13 @@
 """Mindmap-related API routes."""
 import logging
+import orjson
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List
 
 from ..models.schema import (
     CreateMindMapRequest, GenerateChildNodesRequest, 
-    UpdateNodeStatusRequest, MindMapNode, NodeInfo, EdgeInfo
+    UpdateNodeStatusRequest, BulkUpdateNodeStatusRequest, MindMapNode, NodeInfo, EdgeInfo
 )
 from ..services.mindmap import MindMapService
 from ..services.session import SessionService
@@ -62,11 +64,58 @@ async def create_mindmap(
         
         return react_flow_data
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating mindmap: {str(e)}", exc_info=True)
+        logger.error(f"Error creating mindmap: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to create mindmap: {str(e)}")
 
 
+@router.post("/create/stream")
+async def create_mindmap_stream(
+    request: CreateMindMapRequest,
+    mindmap_service: MindMapService = Depends(get_mindmap_service),
+    session_service: SessionService = Depends(get_session_service)
+) -> StreamingResponse:
+    """Create a new mindmap and stream each level's React Flow nodes and edges as server-sent events."""
+    logger.info(f"Streaming mindmap for topic: '{request.topic}' with max_depth={request.max_depth}")
+    
+    async def event_stream():
+        mindmap_nodes = []
+        react_flow_data = {"nodes": [], "edges": []}
+        try:
+            async for level_nodes in mindmap_service.generate_mindmap_levels(
+                request.topic,
+                request.max_depth
+            ):
+                mindmap_nodes.extend(level_nodes)
+                
+                # Positions depend on the whole level, so convert the full map and send only the new level
+                react_flow_data = mindmap_service.convert_to_react_flow_format(mindmap_nodes)
+                level_ids = {node.id for node in level_nodes}
+                level_data = {
+                    "nodes": [node for node in react_flow_data["nodes"] if node["id"] in level_ids],
+                    "edges": [edge for edge in react_flow_data["edges"] if edge["target"] in level_ids]
+                }
+                yield b"data: " + orjson.dumps(level_data) + b"\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming mindmap: {str(e)}")
+            logger.debug("Traceback:", exc_info=True)
+        
+        # Initialize the session with whatever was generated
+        if mindmap_nodes:
+            await session_service.initialize_session(
+                request.session_id,
+                react_flow_data["nodes"],
+                react_flow_data["edges"]
+            )
+        
+        yield b"data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/generate-child-nodes")
 async def generate_child_nodes(
     request: GenerateChildNodesRequest,
@@ -161,8 +210,11 @@ async def generate_child_nodes(
             "edges": new_edges
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating child nodes: {str(e)}", exc_info=True)
+        logger.error(f"Error generating child nodes: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to generate child nodes: {str(e)}")
 
 
@@ -180,15 +232,49 @@ async def update_node_status(
         )
         
         if not success:
-            raise HTTPException(status_code=500, detail=f"Failed to update node status")
+            raise HTTPException(status_code=500, detail="Failed to update node status")
         
         return {"success": True, "status": request.status}
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
     except Exception as e:
         logger.error(f"Error updating node status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update node status: {str(e)}")
 
 
+@router.post("/nodes/update-status/batch")
+async def update_node_statuses(
+    request: BulkUpdateNodeStatusRequest,
+    session_service: SessionService = Depends(get_session_service)
+) -> Dict[str, Any]:
+    """Update the status of several nodes at once."""
+    try:
+        success = await session_service.update_node_statuses(
+            request.session_id,
+            request.statuses
+        )
+        
+        if not success:
+            raise HTTPException(status_code=500, detail="Failed to update node statuses")
+        
+        return {"success": True, "statuses": request.statuses}
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        logger.error(f"Error updating node statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update node statuses: {str(e)}")
+
+
 @router.get("/nodes/{node_id}")
 async def get_node_data(
     node_id: str,
@@ -1,13 +1,15 @@
 """Question-related API routes."""
+import asyncio
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, List, Tuple
+from datetime import datetime, timezone
 
 from ..models.schema import (
-    GenerateQuestionsRequest, AnswerRequest, UnlockCheckRequest,
-    QuestionResponse, AnswerResponse, UnlockCheckResponse, NodeStatus, Question
+    GenerateQuestionsRequest, BatchGenerateQuestionsRequest, AnswerRequest, UnlockCheckRequest, BatchUnlockCheckRequest,
+    QuestionResponse, AnswerResponse, UnlockCheckResponse, NodeStatus, NodeInfo, Question
 )
+from ..services.mindmap import MindMapService
 from ..services.question import QuestionService
 from ..services.session import SessionService
 
@@ -20,6 +22,47 @@ router = APIRouter(
     tags=["questions"],
 )
 
+# Question generations in flight, keyed by (session_id, node_id)
+_inflight_generations: Dict[Tuple[str, str], "asyncio.Task[List[Question]]"] = {}
+
+
+def _shared_generation(
+    question_service: QuestionService,
+    session_id: str,
+    node_id: str,
+    node_label: str,
+    node_content: str,
+    parent_nodes: List[Dict[str, str]],
+    child_nodes: List[Dict[str, str]]
+) -> "asyncio.Future[List[Question]]":
+    """
+    Generate questions for a node, sharing the call with any concurrent request for the same node.
+    
+    Args:
+        question_service: The question service
+        session_id: The session identifier
+        node_id: The node identifier
+        node_label: The label of the node
+        node_content: The content of the node
+        parent_nodes: List of parent node data
+        child_nodes: List of child node data
+        
+    Returns:
+        A shielded future resolving to the generated questions
+    """
+    key = (session_id, node_id)
+    task = _inflight_generations.get(key)
+    if task is None:
+        task = asyncio.ensure_future(question_service.generate_questions(
+            node_content,
+            node_label,
+            parent_nodes,
+            child_nodes
+        ))
+        _inflight_generations[key] = task
+        task.add_done_callback(lambda _: _inflight_generations.pop(key, None))
+    return asyncio.shield(task)
+
 
 def get_question_service():
     """Dependency to get the question service."""
@@ -35,6 +78,13 @@ def get_session_service():
     return services["session"]
 
 
+def get_mindmap_service():
+    """Dependency to get the mindmap service."""
+    from ..app import get_services
+    services = get_services()
+    return services["mindmap"]
+
+
 @router.post("/generate")
 async def generate_questions(
     request: GenerateQuestionsRequest,
@@ -42,17 +92,18 @@ async def generate_questions(
     session_service: SessionService = Depends(get_session_service)
 ) -> QuestionResponse:
     """Generate questions for a specific node."""
+    now = datetime.now(timezone.utc)
     try:
         # Get session data
         session_data = await session_service.get_session_data(request.session_id)
         
         # Store node content in the session for future use if it doesn't exist
         if request.node_id not in session_data.graph_nodes:
-            session_data.graph_nodes[request.node_id] = {
-                "id": request.node_id,
-                "label": request.node_label,
-                "content": request.node_content
-            }
+            session_data.graph_nodes[request.node_id] = NodeInfo(
+                id=request.node_id,
+                label=request.node_label,
+                content=request.node_content
+            )
         
         # Check if we already have questions for this node
         if request.node_id in session_data.nodes:
@@ -65,10 +116,14 @@ async def generate_questions(
                     status=node_data.status
                 )
         
-        # Generate questions using the question service
-        questions = await question_service.generate_questions(
-            request.node_content,
+        # Generate questions using the question service, sharing the call with
+        # any concurrent request for the same node
+        questions = await _shared_generation(
+            question_service,
+            request.session_id,
+            request.node_id,
             request.node_label,
+            request.node_content,
             request.parent_nodes,
             request.child_nodes
         )
@@ -78,7 +133,8 @@ async def generate_questions(
             node_id=request.node_id,
             status="not_started",
             questions=questions,
-            started_at=datetime.utcnow()
+            questions_by_id={q.id: q for q in questions},
+            started_at=now
         )
         
         # Store in session
@@ -88,7 +144,8 @@ async def generate_questions(
         await session_service.storage.update_node_status(
             request.session_id, 
             request.node_id, 
-            node_status
+            node_status,
+            session=session_data
         )
         
         return QuestionResponse(
@@ -97,8 +154,90 @@ async def generate_questions(
             status="not_started"
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating questions: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
+
+
+@router.post("/generate/batch")
+async def generate_questions_batch(
+    request: BatchGenerateQuestionsRequest,
+    question_service: QuestionService = Depends(get_question_service),
+    session_service: SessionService = Depends(get_session_service)
+) -> Dict[str, QuestionResponse]:
+    """Generate questions for several nodes concurrently and save them in one write."""
+    now = datetime.now(timezone.utc)
+    try:
+        # Get session data
+        session_data = await session_service.get_session_data(request.session_id)
+        
+        responses: Dict[str, QuestionResponse] = {}
+        pending: Dict[str, "asyncio.Future[List[Question]]"] = {}
+        for node in request.nodes:
+            # Store node content in the session for future use if it doesn't exist
+            if node.node_id not in session_data.graph_nodes:
+                session_data.graph_nodes[node.node_id] = NodeInfo(
+                    id=node.node_id,
+                    label=node.node_label,
+                    content=node.node_content
+                )
+            
+            # Reuse existing questions for this node
+            node_data = session_data.nodes.get(node.node_id)
+            if node_data is not None and node_data.questions:
+                responses[node.node_id] = QuestionResponse(
+                    node_id=node.node_id,
+                    questions=node_data.questions,
+                    status=node_data.status
+                )
+            elif node.node_id not in pending:
+                pending[node.node_id] = _shared_generation(
+                    question_service,
+                    request.session_id,
+                    node.node_id,
+                    node.node_label,
+                    node.node_content,
+                    node.parent_nodes,
+                    node.child_nodes
+                )
+        
+        # Generate the missing questions concurrently over the shared client
+        generated = await asyncio.gather(*pending.values())
+        
+        statuses: Dict[str, NodeStatus] = {}
+        for node_id, questions in zip(pending, generated):
+            statuses[node_id] = NodeStatus(
+                node_id=node_id,
+                status="not_started",
+                questions=questions,
+                questions_by_id={q.id: q for q in questions},
+                started_at=now
+            )
+            responses[node_id] = QuestionResponse(
+                node_id=node_id,
+                questions=questions,
+                status="not_started"
+            )
+        
+        # Save all new node statuses at once
+        if statuses:
+            session_data.nodes.update(statuses)
+            await session_service.storage.update_node_statuses_bulk(
+                request.session_id,
+                statuses,
+                session=session_data
+            )
+        
+        return responses
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating questions: {str(e)}", exc_info=True)
+        logger.error(f"Error generating questions: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
 
 
@@ -109,6 +248,7 @@ async def answer_question(
     session_service: SessionService = Depends(get_session_service)
 ) -> AnswerResponse:
     """Submit and evaluate an answer to a question."""
+    now = datetime.now(timezone.utc)
     try:
         # Get session data
         session_data = await session_service.get_session_data(request.session_id)
@@ -119,26 +259,23 @@ async def answer_question(
         
         node_data = session_data.nodes[request.node_id]
         
-        # Find the question
-        question_found = False
-        for i, q in enumerate(node_data.questions):
-            if q.id == request.question_id:
-                question = q
-                question_index = i
-                question_found = True
-                break
-                
-        if not question_found:
+        # Find the question, indexing the node's questions and counting the passed ones on first access
+        if not node_data.questions_by_id and node_data.questions:
+            node_data.questions_by_id = {q.id: q for q in node_data.questions}
+            node_data.passed_count = sum(q.status == "passed" for q in node_data.questions)
+        question = node_data.questions_by_id.get(request.question_id)
+        if question is None:
             raise HTTPException(status_code=404, detail="Question not found")
         
         # Mark the node as in progress if it's not already completed
         if node_data.status != "completed":
             node_data.status = "in_progress"
             if not node_data.started_at:
-                node_data.started_at = datetime.utcnow()
+                node_data.started_at = now
         
         # Get node content from session
-        node_content = session_data.graph_nodes.get(request.node_id, {}).content
+        node_info = session_data.graph_nodes.get(request.node_id)
+        node_content = node_info.content if node_info else ""
         
         # Evaluate the answer using the question service
         evaluation = await question_service.evaluate_answer(
@@ -148,29 +285,47 @@ async def answer_question(
         )
         
         # Update the question with evaluation results
+        evaluated_at = datetime.now(timezone.utc)
         question.attempts += 1
         question.last_answer = request.answer
         question.feedback = evaluation.get("feedback", "No feedback provided")
         question.grade = evaluation.get("grade", 0)
+        was_passed = question.status == "passed"
         question.status = "passed" if evaluation.get("passed", False) else "failed"
-        question.updated_at = datetime.utcnow()
+        question.updated_at = evaluated_at
         
-        # Update the question in the node data
-        node_data.questions[question_index] = question
+        # Keep the node's passed counter in sync with the question's new status
+        if question.status == "passed" and not was_passed:
+            node_data.passed_count += 1
+        elif question.status != "passed" and was_passed:
+            node_data.passed_count -= 1
         
         # Check if all questions for this node are passed
-        all_passed = all(q.status == "passed" for q in node_data.questions)
+        all_passed = node_data.passed_count == len(node_data.questions)
+        newly_completed = all_passed and node_data.status != "completed"
         if all_passed:
             node_data.status = "completed"
-            node_data.completed_at = datetime.utcnow()
+            node_data.completed_at = evaluated_at
         
         # Save the updated node data
         await session_service.storage.update_node_status(
             request.session_id, 
             request.node_id, 
-            node_data
+            node_data,
+            session=session_data
         )
         
+        # Completing a node can unlock its children; refresh them all in one write
+        children = session_data.relationships.children.get(request.node_id)
+        if newly_completed and children:
+            refreshed = await session_service.refresh_unlockability(
+                request.session_id,
+                list(children),
+                session=session_data
+            )
+            if not refreshed:
+                logger.error(f"Failed to refresh unlockability of the children of node {request.node_id}")
+        
         return AnswerResponse(
             question_id=request.question_id,
             feedback=question.feedback,
@@ -180,15 +335,20 @@ async def answer_question(
             all_passed=all_passed
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error evaluating answer: {str(e)}", exc_info=True)
+        logger.error(f"Error evaluating answer: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to evaluate answer: {str(e)}")
 
 
 @router.post("/regenerate")
 async def regenerate_questions(
     request: UnlockCheckRequest,
-    session_service: SessionService = Depends(get_session_service)
+    question_service: QuestionService = Depends(get_question_service),
+    session_service: SessionService = Depends(get_session_service),
+    mindmap_service: MindMapService = Depends(get_mindmap_service)
 ) -> Dict[str, str]:
     """Regenerate questions for a node."""
     try:
@@ -208,23 +368,34 @@ async def regenerate_questions(
             node_id=request.node_id,
             status="not_started",
             questions=[],
+            passed_count=0,
             previous_questions=previous_questions,
             previous_status=previous_status,
-            updated_at=datetime.utcnow()
+            updated_at=datetime.now(timezone.utc)
         )
         
+        # Make sure the next generation asks Claude for new questions and children
+        node_info = session_data.graph_nodes.get(request.node_id)
+        if node_info is not None:
+            question_service.forget_questions(node_info.label, node_info.content)
+            mindmap_service.forget_children(node_info.label, node_info.content)
+        
         # Save the updated node data
         session_data.nodes[request.node_id] = node_status
         await session_service.storage.update_node_status(
             request.session_id, 
             request.node_id, 
-            node_status
+            node_status,
+            session=session_data
         )
         
         return {"message": "Questions reset successfully. Generate new questions with the generate endpoint."}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error regenerating questions: {str(e)}", exc_info=True)
+        logger.error(f"Error regenerating questions: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to regenerate questions: {str(e)}")
 
 
@@ -247,6 +418,39 @@ async def check_node_unlockability(
             incomplete_prerequisites=result["incomplete_prerequisites"]
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking node unlockability: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to check node unlockability: {str(e)}") 
+
+
+@router.post("/check-unlockable/batch")
+async def check_nodes_unlockability(
+    request: BatchUnlockCheckRequest,
+    session_service: SessionService = Depends(get_session_service)
+) -> Dict[str, UnlockCheckResponse]:
+    """Check which of several nodes are unlockable in a single request."""
+    try:
+        # Get unlockability status for every node from the session service
+        results = await session_service.check_nodes_unlockability(
+            request.session_id,
+            request.node_ids
+        )
+        
+        return {
+            node_id: UnlockCheckResponse(
+                unlockable=result["unlockable"],
+                reason=result["reason"],
+                incomplete_prerequisites=result["incomplete_prerequisites"]
+            )
+            for node_id, result in results.items()
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error checking node unlockability: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to check node unlockability: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error checking node unlockability: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to check node unlockability: {str(e)}")
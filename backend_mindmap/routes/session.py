@@ -41,8 +41,11 @@ async def initialize_session(
         
         return {"message": "Session initialized successfully", "session_id": graph_data.session_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error initializing session: {str(e)}", exc_info=True)
+        logger.error(f"Error initializing session: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to initialize session: {str(e)}")
 
 
@@ -62,8 +65,11 @@ async def get_session_graph_data(
             "progress": session_data.nodes
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting session graph data: {str(e)}", exc_info=True)
+        logger.error(f"Error getting session graph data: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get session graph data: {str(e)}")
 
 
@@ -77,6 +83,9 @@ async def get_progress(
         session_data = await session_service.get_session_data(session_id)
         return ProgressResponse(nodes=session_data.nodes)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting progress: {str(e)}", exc_info=True)
+        logger.error(f"Error getting progress: {str(e)}")
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get progress: {str(e)}") 
\ No newline at end of file
@@ -1,27 +1,90 @@
 """Standardized service for Anthropic API calls."""
-import json
 import logging
 import anthropic
+import httpx
+import orjson
 from anthropic.types import ContentBlockDeltaEvent, MessageDeltaEvent, MessageStartEvent
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
 
-from ..config.settings import ANTHROPIC_API_KEY, CLAUDE_LATEST, CLAUDE_BACKUP
+from ..config.settings import (
+    ANTHROPIC_API_KEY, ANTHROPIC_MAX_CONNECTIONS, ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS, ANTHROPIC_MAX_RETRIES,
+    CLAUDE_LATEST, CLAUDE_BACKUP
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Process-wide clients keyed by API key so all services share one connection pool per key
+_shared_clients: Dict[str, anthropic.AsyncAnthropic] = {}
+
+
+def get_shared_client(api_key: str = ANTHROPIC_API_KEY) -> anthropic.AsyncAnthropic:
+    """Get the shared Anthropic client for an API key, creating it on first use."""
+    client = _shared_clients.get(api_key)
+    if client is None:
+        client = _shared_clients[api_key] = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            max_retries=ANTHROPIC_MAX_RETRIES,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=ANTHROPIC_MAX_CONNECTIONS,
+                    max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+        )
+    return client
+
+
+async def close_shared_client() -> None:
+    """Close the shared Anthropic clients and their connection pools."""
+    clients = list(_shared_clients.values())
+    _shared_clients.clear()
+    for client in clients:
+        await client.close()
+
+
 class AnthropicService:
     """Service for standardized interactions with Anthropic's Claude API."""
     
     def __init__(self, api_key: str = ANTHROPIC_API_KEY):
-        """Initialize the Anthropic client with API key."""
-        self.client = anthropic.Anthropic(api_key=api_key)
+        """Initialize with the API key used to look up the shared Anthropic client."""
+        self.api_key = api_key
         self.default_model = CLAUDE_LATEST
         self.backup_model = CLAUDE_BACKUP
     
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        """The shared Anthropic client, recreated if it was closed on shutdown."""
+        return get_shared_client(self.api_key)
+    
+    async def _create_with_fallback(self, model: Optional[str] = None, **kwargs: Any) -> Any:
+        """Create a Claude message, retrying with the backup model if the default model fails.
+        
+        Args:
+            model: Claude model to use (defaults to latest)
+            **kwargs: Remaining arguments for messages.create
+            
+        Returns:
+            The Claude API response message
+        """
+        try:
+            return await self.client.messages.create(model=model or self.default_model, **kwargs)
+        except anthropic.BadRequestError:
+            # A malformed request fails the same way on the backup model
+            raise
+        except Exception as e:
+            # Only fall back when the caller did not ask for a specific model
+            if model is not None and model != self.default_model:
+                raise
+            logger.error(f"Error in Claude API call: {str(e)}")
+            logger.info(f"Retrying with backup model {self.backup_model}")
+            return await self.client.messages.create(model=self.backup_model, **kwargs)
+
     async def generate_text(
         self, 
         prompt: str, 
+        system: str = "",
         temperature: float = 0.2, 
         max_tokens: int = 1024,
         model: Optional[str] = None
@@ -30,6 +93,7 @@ class AnthropicService:
         
         Args:
             prompt: The text prompt to send to Claude
+            system: Optional system prompt for Claude
             temperature: Controls randomness (0.0 to 1.0)
             max_tokens: Maximum tokens in the response
             model: Claude model to use (defaults to latest)
@@ -40,11 +104,13 @@ class AnthropicService:
         try:
             logger.info(f"Sending text generation request to Claude")
             
-            response = self.client.messages.create(
-                model=model or self.default_model,
+            extra_args = {"system": system} if system else {}
+            response = await self._create_with_fallback(
+                model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
-                messages=[{"role": "user", "content": prompt}]
+                messages=[{"role": "user", "content": prompt}],
+                **extra_args
             )
             
             if not response.content or not response.content[0].text:
@@ -55,27 +121,7 @@ class AnthropicService:
             return response.content[0].text
             
         except Exception as e:
-            logger.error(f"Error in Claude API call: {str(e)}", exc_info=True)
-            
-            # Attempt with backup model if primary failed and a different model was not specified
-            if model is None or model == self.default_model:
-                try:
-                    logger.info(f"Retrying with backup model {self.backup_model}")
-                    
-                    response = self.client.messages.create(
-                        model=self.backup_model,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    
-                    if response.content and response.content[0].text:
-                        logger.info(f"Successfully received text from backup model")
-                        return response.content[0].text
-                        
-                except Exception as backup_error:
-                    logger.error(f"Backup model also failed: {str(backup_error)}", exc_info=True)
-            
+            logger.error(f"Claude text generation failed: {str(e)}", exc_info=True)
             # Return empty string on complete failure
             return ""
 
@@ -104,8 +150,8 @@ class AnthropicService:
         try:
             logger.info(f"Sending tool-use request to Claude with tool: {tool_schema['name']}")
             
-            message = self.client.messages.create(
-                model=model or self.default_model,
+            message = await self._create_with_fallback(
+                model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 system=system or "You are a helpful assistant.",
@@ -124,30 +170,7 @@ class AnthropicService:
                 return {}
                 
         except Exception as e:
-            logger.error(f"Error in Claude API tool call: {str(e)}", exc_info=True)
-            
-            # Attempt with backup model if primary failed and a different model was not specified
-            if model is None or model == self.default_model:
-                try:
-                    logger.info(f"Retrying tool call with backup model {self.backup_model}")
-                    
-                    message = self.client.messages.create(
-                        model=self.backup_model,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        system=system or "You are a helpful assistant.",
-                        messages=[{"role": "user", "content": prompt}],
-                        tools=[tool_schema]
-                    )
-                    
-                    tool_output = self._extract_tool_output(message)
-                    if tool_output:
-                        logger.info(f"Successfully extracted tool output from backup model")
-                        return tool_output
-                        
-                except Exception as backup_error:
-                    logger.error(f"Backup model tool call also failed: {str(backup_error)}", exc_info=True)
-            
+            logger.error(f"Claude tool call failed: {str(e)}", exc_info=True)
             # Return empty dict on complete failure
             return {}
 
@@ -174,8 +197,8 @@ class AnthropicService:
         try:
             logger.info(f"Sending chat completion request to Claude with {len(messages)} messages")
             
-            response = self.client.messages.create(
-                model=model or self.default_model,
+            response = await self._create_with_fallback(
+                model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 system=system,
@@ -190,31 +213,65 @@ class AnthropicService:
             return response.content[0].text
             
         except Exception as e:
-            logger.error(f"Error in Claude chat completion: {str(e)}", exc_info=True)
-            
-            # Attempt with backup model if primary failed and a different model was not specified
-            if model is None or model == self.default_model:
-                try:
-                    logger.info(f"Retrying chat completion with backup model {self.backup_model}")
-                    
-                    response = self.client.messages.create(
-                        model=self.backup_model,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        system=system,
-                        messages=messages
-                    )
-                    
-                    if response.content and response.content[0].text:
-                        logger.info(f"Successfully received chat response from backup model")
-                        return response.content[0].text
-                        
-                except Exception as backup_error:
-                    logger.error(f"Backup model chat completion also failed: {str(backup_error)}", exc_info=True)
-            
-            # Return empty string on complete failure
+            logger.error(f"Claude chat completion failed: {str(e)}", exc_info=True)
+            # Return an apology on complete failure
             return "I apologize, but I encountered an error processing your request. Please try again."
 
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        system: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a response in a multi-turn conversation as text deltas.
+        
+        Follows the same fallback rules as _create_with_fallback, which wraps a
+        single awaited call and so cannot wrap a stream. The backup model is only
+        tried if the default model fails before yielding any text, since a
+        partially delivered answer cannot be taken back.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system: System prompt for Claude
+            temperature: Controls randomness (0.0 to 1.0)
+            max_tokens: Maximum tokens in the response
+            model: Claude model to use (defaults to latest)
+            
+        Yields:
+            Text deltas from Claude as they are generated
+        """
+        logger.info(f"Sending streaming chat request to Claude with {len(messages)} messages")
+        
+        models = [model or self.default_model]
+        # Only fall back when the caller did not ask for a specific model
+        if model is None or model == self.default_model:
+            models.append(self.backup_model)
+        
+        for attempt, attempt_model in enumerate(models):
+            started = False
+            try:
+                async with self.client.messages.stream(
+                    model=attempt_model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    system=system,
+                    messages=messages
+                ) as stream:
+                    async for text in stream.text_stream:
+                        started = True
+                        yield text
+                return
+            except anthropic.BadRequestError:
+                # A malformed request fails the same way on the backup model
+                raise
+            except Exception as e:
+                if started or attempt == len(models) - 1:
+                    raise
+                logger.error(f"Error in Claude streaming call: {str(e)}")
+                logger.info(f"Retrying with backup model {self.backup_model}")
+
     def _extract_tool_output(self, message: Any) -> Dict[str, Any]:
         """Extract tool output from Claude's response.
         
@@ -225,42 +282,35 @@ class AnthropicService:
             Extracted tool output as a dictionary
         """
         try:
-            tool_outputs = []
-            
-            # Process message content
+            # Find the first tool_use block
             for content in message.content:
-                # Determine content type
-                if hasattr(content, 'type'):
-                    content_type = content.type
-                elif isinstance(content, dict) and 'type' in content:
-                    content_type = content['type']
+                if isinstance(content, dict):
+                    content_type = content.get("type")
                 else:
-                    content_type = str(type(content))
-                    
-                logger.debug(f"Processing content block of type: {content_type}")
+                    content_type = getattr(content, "type", None)
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Processing content block of type: {content_type or type(content)}")
                 
-                # Extract tool_use content
-                if isinstance(content, dict) and content.get("type") == "tool_use":
-                    tool_outputs.append(content)
-                elif hasattr(content, 'type') and content.type == "tool_use":
+                if content_type == "tool_use":
                     # Convert to dict if it's an object
-                    tool_outputs.append(vars(content) if hasattr(content, '__dict__') else content)
-            
-            if not tool_outputs:
+                    tool_output = content if isinstance(content, dict) else (
+                        vars(content) if hasattr(content, '__dict__') else content
+                    )
+                    break
+            else:
                 logger.warning("No tool outputs found in Claude response")
                 return {}
             
-            # Process the first tool output
-            tool_output = tool_outputs[0]
             input_data = tool_output.get("input", "{}")
             
             # Parse the input data
             if isinstance(input_data, dict):
                 return input_data
             else:
-                return json.loads(input_data)
+                return orjson.loads(input_data)
                 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse tool output as JSON: {str(e)}")
             return {}
         except Exception as e:
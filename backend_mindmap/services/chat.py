@@ -1,8 +1,9 @@
 """Service for handling chat interactions with nodes."""
 import logging
+import string
 import uuid
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+from typing import AsyncIterator, Dict, List, Any, Optional
+from datetime import datetime, timezone
 
 from ..models.schema import ChatMessage, NodeInfo
 from .anthropic import AnthropicService
@@ -10,6 +11,18 @@ from .anthropic import AnthropicService
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Static scaffolding of the chat system prompt; only the node details vary per request
+_CHAT_SYSTEM_TEMPLATE = string.Template("""You are an AI tutor specialized in teaching about '$label'. 
+Your goal is to help the user understand this topic in depth.
+
+Here is the content about '$label' that you should use as your primary source of information:
+---
+$content
+---
+
+$parents$children
+Your responses should be educational, accurate, and helpful. Encourage the user to ask questions and engage with the material.""")
+
 
 class ChatService:
     """Service for handling chat interactions with nodes."""
@@ -32,7 +45,7 @@ class ChatService:
             id=str(uuid.uuid4()),
             role="assistant",
             content=f"Hello! I'm your guide for learning about '{node_info.label}'. What would you like to know or discuss about this topic?",
-            created_at=datetime.utcnow()
+            created_at=datetime.now(timezone.utc)
         )
         
         return welcome_message
@@ -77,6 +90,39 @@ class ChatService:
         
         return response
     
+    async def generate_chat_response_stream(
+        self,
+        node_info: NodeInfo,
+        message_history: List[Dict[str, str]],
+        parent_nodes: List[Dict[str, str]] = [],
+        child_nodes: List[Dict[str, str]] = []
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response in a chat about a node.
+        
+        Args:
+            node_info: Information about the node
+            message_history: List of previous chat messages
+            parent_nodes: List of parent node data
+            child_nodes: List of child node data
+            
+        Yields:
+            Response text deltas
+        """
+        logger.info(f"Streaming chat response for node: {node_info.label}")
+        
+        system_prompt = self._create_chat_system_prompt(
+            node_info, 
+            parent_nodes, 
+            child_nodes
+        )
+        
+        async for text in self.anthropic.chat_completion_stream(
+            messages=message_history,
+            system=system_prompt
+        ):
+            yield text
+    
     def _create_chat_system_prompt(
         self,
         node_info: NodeInfo,
@@ -94,27 +140,30 @@ class ChatService:
         Returns:
             System prompt
         """
-        system_prompt = f"""You are an AI tutor specialized in teaching about '{node_info.label}'. 
-Your goal is to help the user understand this topic in depth.
-
-Here is the content about '{node_info.label}' that you should use as your primary source of information:
----
-{node_info.content}
----
-
-"""
-        
         # Add parent and child node context if available
-        if parent_nodes:
-            system_prompt += "\nThis topic is related to these parent topics:\n"
-            for i, parent in enumerate(parent_nodes):
-                system_prompt += f"{i+1}. {parent.get('label', 'Unknown')}: {parent.get('content', 'No content')[:200]}...\n"
-        
-        if child_nodes:
-            system_prompt += "\nThis topic has these subtopics:\n"
-            for i, child in enumerate(child_nodes):
-                system_prompt += f"{i+1}. {child.get('label', 'Unknown')}: {child.get('content', 'No content')[:200]}...\n"
-        
-        system_prompt += "\nYour responses should be educational, accurate, and helpful. Encourage the user to ask questions and engage with the material."
+        return _CHAT_SYSTEM_TEMPLATE.substitute(
+            label=node_info.label,
+            content=node_info.content,
+            parents=self._format_related_nodes("This topic is related to these parent topics:", parent_nodes),
+            children=self._format_related_nodes("This topic has these subtopics:", child_nodes)
+        )
+    
+    @staticmethod
+    def _format_related_nodes(header: str, nodes: List[Dict[str, str]]) -> str:
+        """
+        Format related nodes as a numbered context block for the system prompt.
         
-        return system_prompt 
\ No newline at end of file
+        Args:
+            header: Heading line for the block
+            nodes: List of related node data
+            
+        Returns:
+            Formatted block, or an empty string if there are no nodes
+        """
+        if not nodes:
+            return ""
+        lines = [
+            f"{i}. {node.get('label', 'Unknown')}: {node.get('content_preview', 'No content')}...\n"
+            for i, node in enumerate(nodes, 1)
+        ]
+        return f"\n{header}\n" + "".join(lines) 
\ No newline at end of file
@@ -1,12 +1,25 @@
 """Service for generating and managing mindmaps."""
+import asyncio
 import logging
 import json
 import math
-from typing import Dict, List, Optional, Any
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import uuid
 
-from ..models.schema import MindMapNode, NodeInfo, EdgeInfo, NodeStatus
-from ..config.settings import DEFAULT_MAX_DEPTH, DEFAULT_MAX_CHILDREN
+from pydantic import BaseModel, ValidationError
+
+from ..models.schema import (
+    MindMapNode, NodeInfo, EdgeInfo, NodeStatus,
+    GeneratedNodeData, GeneratedNodesPayload, GeneratedChildrenPayload
+)
+from ..config.settings import (
+    DEFAULT_MAX_DEPTH, DEFAULT_MAX_CHILDREN, MAX_CONCURRENT_GENERATIONS, PARENTS_PER_REQUEST,
+    MAX_PARENTS_PER_REQUEST, PACKED_REQUEST_TARGET_SECONDS, GENERATION_CACHE_MAX_ENTRIES,
+    PROMPT_CONTENT_TOKEN_BUDGET
+)
+from ..utils.helpers import content_cache_key, truncate_to_token_budget
 from .anthropic import AnthropicService
 
 # Configure logging
@@ -65,6 +78,246 @@ CREATE_CHILD_NODES_TOOL = {
     }
 }
 
+# Define the tool schema for Anthropic to use for creating child nodes of several parents at once
+CREATE_CHILDREN_FOR_PARENTS_TOOL = {
+    "name": "create_children_for_parents",
+    "description": "Create child nodes for several parent nodes in a mindmap",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "parents": {
+                "type": "array",
+                "description": "One entry per parent node, each with its list of child nodes",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "parent_id": {"type": "string", "description": "ID of the parent node"},
+                        "children": {
+                            "type": "array",
+                            "description": "List of child nodes to add to the parent",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "id": {"type": "string", "description": "Unique identifier for the node"},
+                                    "label": {"type": "string", "description": "Short title for the node (max 50 chars)"},
+                                    "content": {"type": "string", "description": "Detailed explanation of the concept (100-300 chars)"}
+                                },
+                                "required": ["id", "label", "content"]
+                            }
+                        }
+                    },
+                    "required": ["parent_id", "children"]
+                }
+            }
+        },
+        "required": ["parents"]
+    }
+}
+
+# Output token budget for a packed multi-parent call (the backup model's maximum)
+MULTI_PARENT_MAX_TOKENS = 4096
+
+# Shared child-node guidelines, sent as the system prompt of every expansion request
+CHILD_NODES_SYSTEM_PROMPT = """You are an expert at expanding educational topics into well-structured, comprehensive subtopics.
+
+Each child node should explore a specific aspect, component, or sub-topic of its parent concept.
+Each child node needs:
+1. A unique id (use the parent id as a prefix, e.g. if parent is "1.2", use "1.2.1", "1.2.2", etc.)
+2. A short label/title that's clear and descriptive (max 50 characters)
+3. Content that explains the concept in more detail (100-300 characters)
+
+Make sure the child nodes:
+- Are distinct from each other (cover different aspects)
+- Are directly related to their parent topic
+- Together provide comprehensive coverage of their parent topic
+- Have educational value and accurate content
+- Have an appropriate level of detail (not too broad, not too specific)"""
+
+
+# Prompt templates, formatted with only the per-request fields
+ROOT_NODE_SYSTEM_PROMPT = "You are an expert at organizing knowledge into structured, hierarchical mindmaps."
+
+_ROOT_PROMPT = """Create a root node for an educational mindmap about "{topic}".
+
+The root node should:
+- Have a clear, concise label (title) representing the main topic
+- Include a comprehensive but concise content description (100-300 characters)
+- Use the ID "1" for the root node
+- Have no parent_id (it's the root)
+
+Use the create_mindmap tool to return just this single root node."""
+
+_CHILD_PROMPT = """I have a concept or topic in a mindmap that needs to be expanded with child nodes.
+The parent node details are:
+
+ID: {parent_id}
+Label: "{parent_label}"
+Content: "{parent_content}"
+
+Please create {max_children} child nodes that expand on this topic in a logical and educational way.
+
+Use the create_child_nodes tool to structure this information.
+The parent_id reference of each child node should be: "{parent_id}"
+"""
+
+_MULTI_PARENT_LINE = '- ID: {parent_id} | Label: "{parent_label}" | Content: "{parent_content}"'
+
+_MULTI_PARENT_PROMPT = """I have several concepts or topics in a mindmap that each need to be expanded with child nodes.
+The parent node details are:
+
+{parent_lines}
+
+For each parent, please create {max_children} child nodes that expand on its topic in a logical and educational way.
+
+Use the create_children_for_parents tool to structure this information, with one entry per parent.
+Each entry needs the parent_id exactly as given above and its list of children."""
+
+# Placeholder content used when Claude fails to return nodes
+_DEFAULT_ROOT_CONTENT = "Overview of {topic}: A comprehensive exploration of this subject and its key aspects."
+_DEFAULT_CHILD_LABEL = "Aspect {index} of {parent_label}"
+_DEFAULT_CHILD_CONTENT = "This is a key component of {parent_label} that explores important concepts related to this subject."
+
+
+def _parse_tool_output(payload_model: type, tool_output: Dict[str, Any]) -> BaseModel:
+    """
+    Validate Claude's tool output against its payload model.
+    
+    Args:
+        payload_model: Pydantic model describing the tool's input schema
+        tool_output: Tool input returned by Claude
+        
+    Returns:
+        The validated payload, or an empty payload if the output is malformed
+    """
+    try:
+        return payload_model.model_validate(tool_output or {})
+    except ValidationError as e:
+        logger.warning(f"Malformed tool output from Claude ({e.error_count()} errors), using defaults")
+        return payload_model()
+
+
+def _default_root(topic: str) -> MindMapNode:
+    """
+    Create a placeholder root node for a topic.
+    
+    Args:
+        topic: The main topic for the mindmap
+        
+    Returns:
+        Default root MindMapNode
+    """
+    return MindMapNode(
+        id="1",
+        label=topic,
+        content=_DEFAULT_ROOT_CONTENT.format(topic=topic),
+        parent_id=None
+    )
+
+
+def _child_id(parent_id: str, index: int) -> str:
+    """
+    Build the ID of a parent's child node.
+    
+    Args:
+        parent_id: ID of the parent node
+        index: 1-based position of the child under its parent
+        
+    Returns:
+        Child node ID
+    """
+    return f"{parent_id}.{index}"
+
+
+def _default_children(parent_id: str, parent_label: str, count: int) -> List[MindMapNode]:
+    """
+    Create placeholder child nodes for a parent.
+    
+    Args:
+        parent_id: ID of the parent node
+        parent_label: Label of the parent node
+        count: Number of children to create
+        
+    Returns:
+        List of default child MindMapNode objects
+    """
+    content = _DEFAULT_CHILD_CONTENT.format(parent_label=parent_label)
+    return [
+        MindMapNode(
+            id=_child_id(parent_id, i),
+            label=_DEFAULT_CHILD_LABEL.format(index=i, parent_label=parent_label),
+            content=content,
+            parent_id=parent_id
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def _compute_node_levels(nodes: List[MindMapNode]) -> Dict[str, int]:
+    """
+    Compute each node's depth below the root, reusing the levels of known ancestors.
+    
+    Args:
+        nodes: List of MindMapNode objects
+        
+    Returns:
+        Dictionary mapping node IDs to their level (root is level 0)
+    """
+    nodes_by_id = {node.id: node for node in nodes}
+    levels: Dict[str, int] = {}
+    
+    for node in nodes:
+        # Nodes normally arrive root-first, so the parent's level is already known
+        if not node.parent_id:
+            levels[node.id] = 0
+            continue
+        parent_level = levels.get(node.parent_id)
+        if parent_level is not None:
+            levels[node.id] = parent_level + 1
+            continue
+        
+        # Otherwise walk up until reaching the root or an ancestor whose level is already known
+        path = []
+        current = node
+        while True:
+            if current.id in levels:
+                base_level = levels[current.id]
+                break
+            path.append(current)
+            if not current.parent_id:
+                base_level = -1
+                break
+            parent = nodes_by_id.get(current.parent_id)
+            if parent is None:
+                # An unknown parent still counts as one level up
+                base_level = 0
+                break
+            current = parent
+        
+        for offset, ancestor in enumerate(reversed(path), 1):
+            levels[ancestor.id] = base_level + offset
+    
+    return levels
+
+
+@lru_cache(maxsize=64)
+def _semicircle_offsets(child_count: int) -> Tuple[Tuple[float, float], ...]:
+    """
+    Compute child offsets from the parent, spread evenly in a semi-circle below it.
+    
+    Args:
+        child_count: Number of children to position
+        
+    Returns:
+        Tuple of (x, y) offsets relative to the parent position
+    """
+    radius = 250  # Distance from parent
+    step = math.pi / (child_count - 1) if child_count > 1 else 0.0
+    start = 0.0 if child_count > 1 else math.pi * 0.5
+    return tuple(
+        (radius * math.cos(start + i * step), 200 + radius * math.sin(start + i * step) * 0.5)
+        for i in range(child_count)
+    )
+
 
 class MindMapService:
     """Service for generating and managing mindmaps."""
@@ -72,6 +325,12 @@ class MindMapService:
     def __init__(self, anthropic_service: AnthropicService):
         """Initialize with a reference to the Anthropic service."""
         self.anthropic = anthropic_service
+        # Generated (label, content) pairs keyed by a hash of the parent's label and content, then by max_children
+        self._child_cache: Dict[str, Dict[int, List[Tuple[str, str]]]] = {}
+        # Parents packed into one call, tuned by _record_packed_call
+        self._parents_per_request = PARENTS_PER_REQUEST
+        # Child generations in flight, keyed by (parent_id, parent_content, parent_label, max_children)
+        self._inflight_children: Dict[Tuple[str, str, str, int], "asyncio.Task[List[MindMapNode]]"] = {}
     
     async def generate_root_node(self, topic: str) -> MindMapNode:
         """
@@ -86,43 +345,27 @@ class MindMapService:
         logger.info(f"Generating root node for topic: '{topic}'")
         
         # Create the prompt for Claude
-        prompt = f"""
-        Create a root node for an educational mindmap about "{topic}".
-        
-        The root node should:
-        - Have a clear, concise label (title) representing the main topic
-        - Include a comprehensive but concise content description (100-300 characters)
-        - Use the ID "1" for the root node
-        - Have no parent_id (it's the root)
-        
-        Use the create_mindmap tool to return just this single root node.
-        """
-        
-        system_prompt = "You are an expert at organizing knowledge into structured, hierarchical mindmaps."
+        prompt = _ROOT_PROMPT.format(topic=topic)
         
         try:
             # Use the anthropic service to generate the root node
             tool_output = await self.anthropic.use_tool(
                 prompt=prompt,
                 tool_schema=CREATE_MINDMAP_TOOL,
-                system=system_prompt
+                system=ROOT_NODE_SYSTEM_PROMPT
             )
             
-            if not tool_output or "nodes" not in tool_output or not tool_output["nodes"]:
+            payload = _parse_tool_output(GeneratedNodesPayload, tool_output)
+            if not payload.nodes:
                 logger.warning("No nodes returned from Claude. Creating default root node.")
-                return MindMapNode(
-                    id="1",
-                    label=topic,
-                    content=f"Overview of {topic}: A comprehensive exploration of this subject and its key aspects.",
-                    parent_id=None
-                )
+                return _default_root(topic)
             
             # Take the first node as the root node
-            root_node_data = tool_output["nodes"][0]
+            root_node_data = payload.nodes[0]
             root_node = MindMapNode(
-                id=root_node_data.get("id", "1"),
-                label=root_node_data.get("label", topic),
-                content=root_node_data.get("content", f"Overview of {topic}"),
+                id=root_node_data.id or "1",
+                label=root_node_data.label or topic,
+                content=root_node_data.content or f"Overview of {topic}",
                 parent_id=None
             )
             
@@ -133,12 +376,7 @@ class MindMapService:
         except Exception as e:
             logger.error(f"Error generating root node with Claude: {str(e)}", exc_info=True)
             # Return a default root node on error
-            return MindMapNode(
-                id="1",
-                label=topic,
-                content=f"Overview of {topic}: A comprehensive exploration of this subject and its key aspects.",
-                parent_id=None
-            )
+            return _default_root(topic)
     
     async def generate_child_nodes(
         self,
@@ -159,90 +397,395 @@ class MindMapService:
         Returns:
             List of child MindMapNode objects
         """
-        logger.info(f"Starting child nodes generation for parent: '{parent_label}' (ID: {parent_id}) with max_children={max_children}")
+        # Share one generation between concurrent requests for the same parent
+        key = (parent_id, parent_content, parent_label, max_children)
+        task = self._inflight_children.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_child_nodes(
+                parent_id,
+                parent_content,
+                parent_label,
+                max_children
+            ))
+            self._inflight_children[key] = task
+            task.add_done_callback(lambda _: self._inflight_children.pop(key, None))
+        return list(await asyncio.shield(task))
+    
+    async def _generate_child_nodes(
+        self,
+        parent_id: str,
+        parent_content: str,
+        parent_label: str,
+        max_children: int
+    ) -> List[MindMapNode]:
+        """
+        Generate child nodes for a parent, using the cache before calling Claude.
         
-        # Create the prompt for Claude
-        prompt = f"""
-        I have a concept or topic in a mindmap that needs to be expanded with child nodes. 
-        The parent node details are:
-        
-        ID: {parent_id}
-        Label: "{parent_label}"
-        Content: "{parent_content}"
-        
-        Please create {max_children} child nodes that expand on this topic in a logical and educational way.
-        Each child node should explore a specific aspect, component, or sub-topic of the parent concept.
-        
-        Use the create_child_nodes tool to structure this information.
-        Each child node needs:
-        1. A unique id (use the parent id as a prefix, e.g. if parent is "1.2", use "1.2.1", "1.2.2", etc.)
-        2. A short label/title that's clear and descriptive (max 50 characters)
-        3. Content that explains the concept in more detail (100-300 characters)
-        4. The parent_id reference which should be: "{parent_id}"
-        
-        Make sure the child nodes:
-        - Are distinct from each other (cover different aspects)
-        - Are directly related to the parent topic
-        - Together provide comprehensive coverage of the parent topic
-        - Have educational value and accurate content
-        - Have an appropriate level of detail (not too broad, not too specific)
+        Args:
+            parent_id: ID of the parent node
+            parent_content: Content of the parent node
+            parent_label: Label of the parent node
+            max_children: Maximum number of children to generate
+            
+        Returns:
+            List of child MindMapNode objects
         """
+        logger.info(f"Starting child nodes generation for parent: '{parent_label}' (ID: {parent_id}) with max_children={max_children}")
+        
+        # Reuse children generated earlier for the same parent topic
+        cache_key = content_cache_key(parent_label, parent_content)
+        cached_nodes = self._cached_children(cache_key, parent_id, max_children)
+        if cached_nodes is not None:
+            logger.info(f"Using cached child nodes for parent: '{parent_label}' (ID: {parent_id})")
+            return cached_nodes
         
-        system_prompt = "You are an expert at expanding educational topics into well-structured, comprehensive subtopics."
+        # Create the prompt for Claude
+        prompt = self._child_nodes_prompt(parent_id, parent_content, parent_label, max_children)
         
         try:
             # Use the anthropic service to generate child nodes
             tool_output = await self.anthropic.use_tool(
                 prompt=prompt,
                 tool_schema=CREATE_CHILD_NODES_TOOL,
-                system=system_prompt
+                system=CHILD_NODES_SYSTEM_PROMPT
             )
             
-            if not tool_output or "nodes" not in tool_output or not tool_output["nodes"]:
-                logger.warning(f"No nodes returned from Claude for parent: {parent_id}. Creating default child nodes.")
-                # Create default child nodes
-                default_nodes = []
-                for i in range(1, max_children + 1):
-                    child_id = f"{parent_id}.{i}"
-                    default_nodes.append(MindMapNode(
-                        id=child_id,
-                        label=f"Aspect {i} of {parent_label}",
-                        content=f"This is a key component of {parent_label} that explores important concepts related to this subject.",
-                        parent_id=parent_id
-                    ))
-                logger.info(f"Created {len(default_nodes)} default child nodes for parent: {parent_id}")
-                return default_nodes
-            
-            # Convert to MindMapNode objects
-            child_nodes = []
-            for node_data in tool_output["nodes"]:
-                child_node = MindMapNode(
-                    id=node_data.get("id", f"{parent_id}.{len(child_nodes)+1}"),
-                    label=node_data.get("label", f"Aspect of {parent_label}"),
-                    content=node_data.get("content", f"A key component of {parent_label}"),
-                    parent_id=parent_id
-                )
-                child_nodes.append(child_node)
-            
-            logger.info(f"Successfully generated {len(child_nodes)} child nodes for parent: '{parent_label}' (ID: {parent_id})")
-            
+            payload = _parse_tool_output(GeneratedNodesPayload, tool_output)
+            child_nodes = self._build_child_nodes(payload.nodes, parent_id, parent_label, max_children)
+            if payload.nodes:
+                self._store_children(cache_key, max_children, child_nodes)
             return child_nodes
         
         except Exception as e:
             logger.error(f"Error generating child nodes with Claude: {str(e)}", exc_info=True)
             # On error, return some default child nodes instead of failing
-            default_nodes = []
-            for i in range(1, max_children + 1):
-                child_id = f"{parent_id}.{i}"
-                default_nodes.append(MindMapNode(
-                    id=child_id,
-                    label=f"Aspect {i} of {parent_label}",
-                    content=f"This is a key component of {parent_label} that explores important concepts related to this subject.",
-                    parent_id=parent_id
-                ))
+            default_nodes = _default_children(parent_id, parent_label, max_children)
             logger.info(f"Created {len(default_nodes)} default child nodes after error for parent: {parent_id}")
             return default_nodes
     
+    def _cached_children(
+        self,
+        cache_key: str,
+        parent_id: str,
+        max_children: int
+    ) -> Optional[List[MindMapNode]]:
+        """
+        Rebuild cached child nodes for a parent.
+        
+        Args:
+            cache_key: Cache key for the parent's label and content
+            parent_id: ID of the parent node the children are attached to
+            max_children: Number of children the cached entry was generated with
+            
+        Returns:
+            List of child MindMapNode objects, or None on a cache miss
+        """
+        cached = self._child_cache.get(cache_key, {}).get(max_children)
+        if cached is None:
+            return None
+        return [
+            MindMapNode.model_construct(id=_child_id(parent_id, i), label=label, content=content, parent_id=parent_id)
+            for i, (label, content) in enumerate(cached, 1)
+        ]
+    
+    def _store_children(self, cache_key: str, max_children: int, child_nodes: List[MindMapNode]) -> None:
+        """
+        Cache generated child nodes, evicting the oldest entry when full.
+        
+        Args:
+            cache_key: Cache key for the parent's label and content
+            max_children: Number of children requested from Claude
+            child_nodes: Child nodes generated by Claude
+        """
+        if cache_key not in self._child_cache and len(self._child_cache) >= GENERATION_CACHE_MAX_ENTRIES:
+            self._child_cache.pop(next(iter(self._child_cache)))
+        self._child_cache.setdefault(cache_key, {})[max_children] = [
+            (node.label, node.content) for node in child_nodes
+        ]
+    
+    def forget_children(self, parent_label: str, parent_content: str) -> None:
+        """
+        Drop cached child nodes for a parent so the next expansion calls Claude again.
+        
+        Args:
+            parent_label: Label of the parent node
+            parent_content: Content of the parent node
+        """
+        self._child_cache.pop(content_cache_key(parent_label, parent_content), None)
+    
+    def _child_nodes_prompt(
+        self,
+        parent_id: str,
+        parent_content: str,
+        parent_label: str,
+        max_children: int
+    ) -> str:
+        """
+        Build the prompt asking Claude to expand a parent node into child nodes.
+        
+        Args:
+            parent_id: ID of the parent node
+            parent_content: Content of the parent node
+            parent_label: Label of the parent node
+            max_children: Number of children to generate
+            
+        Returns:
+            Prompt string for Claude
+        """
+        return _CHILD_PROMPT.format(
+            parent_id=parent_id,
+            parent_label=parent_label,
+            parent_content=truncate_to_token_budget(parent_content, PROMPT_CONTENT_TOKEN_BUDGET),
+            max_children=max_children
+        )
+    
+    def _build_child_nodes(
+        self,
+        nodes: List[GeneratedNodeData],
+        parent_id: str,
+        parent_label: str,
+        max_children: int
+    ) -> List[MindMapNode]:
+        """
+        Convert validated tool output nodes into child nodes, falling back to defaults.
+        
+        Args:
+            nodes: Child node data returned by Claude
+            parent_id: ID of the parent node
+            parent_label: Label of the parent node
+            max_children: Number of default children to create if there are no nodes
+            
+        Returns:
+            List of child MindMapNode objects
+        """
+        if not nodes:
+            logger.warning(f"No nodes returned from Claude for parent: {parent_id}. Creating default child nodes.")
+            # Create default child nodes
+            default_nodes = _default_children(parent_id, parent_label, max_children)
+            logger.info(f"Created {len(default_nodes)} default child nodes for parent: {parent_id}")
+            return default_nodes
+        
+        # Convert to MindMapNode objects; the fields were already validated as
+        # strings by the payload model, so skip re-validating each node. IDs are
+        # always derived from the parent so cached and fresh children match.
+        child_nodes = [
+            MindMapNode.model_construct(
+                id=_child_id(parent_id, i),
+                label=node_data.label or f"Aspect of {parent_label}",
+                content=node_data.content or f"A key component of {parent_label}",
+                parent_id=parent_id
+            )
+            for i, node_data in enumerate(nodes, 1)
+        ]
+        
+        logger.info(f"Successfully generated {len(child_nodes)} child nodes for parent: '{parent_label}' (ID: {parent_id})")
+        
+        return child_nodes
+    
+    async def generate_child_nodes_multi(
+        self,
+        parents: List[MindMapNode],
+        max_children: int = DEFAULT_MAX_CHILDREN
+    ) -> Dict[str, List[MindMapNode]]:
+        """
+        Generate child nodes for several parents with a single Claude call.
+        
+        Packing siblings into one request sends the shared instructions once
+        instead of once per parent.
+        
+        Args:
+            parents: Parent nodes to expand
+            max_children: Maximum number of children per parent
+            
+        Returns:
+            Dictionary mapping parent node IDs to their child nodes; parents missing
+            from Claude's response are left out
+        """
+        logger.info(f"Starting packed child generation for {len(parents)} parents with max_children={max_children}")
+        
+        # Serve parents whose topic was already expanded from the cache
+        children_by_parent = {}
+        cache_keys = {}
+        uncached_parents = []
+        for parent in parents:
+            cache_key = content_cache_key(parent.label, parent.content)
+            cached_nodes = self._cached_children(cache_key, parent.id, max_children)
+            if cached_nodes is not None:
+                children_by_parent[parent.id] = cached_nodes
+            else:
+                cache_keys[parent.id] = cache_key
+                uncached_parents.append(parent)
+        
+        if not uncached_parents:
+            logger.info(f"Using cached child nodes for all {len(parents)} parents")
+            return children_by_parent
+        parents = uncached_parents
+        
+        parents_by_id = {parent.id: parent for parent in parents}
+        parent_lines = "\n".join(
+            _MULTI_PARENT_LINE.format(
+                parent_id=parent.id,
+                parent_label=parent.label,
+                parent_content=truncate_to_token_budget(parent.content, PROMPT_CONTENT_TOKEN_BUDGET)
+            )
+            for parent in parents
+        )
+        prompt = _MULTI_PARENT_PROMPT.format(parent_lines=parent_lines, max_children=max_children)
+        
+        # Only calls that reach Claude are timed, so cache hits do not grow the packing size
+        started = time.monotonic()
+        try:
+            tool_output = await self.anthropic.use_tool(
+                prompt=prompt,
+                tool_schema=CREATE_CHILDREN_FOR_PARENTS_TOOL,
+                system=CHILD_NODES_SYSTEM_PROMPT,
+                max_tokens=MULTI_PARENT_MAX_TOKENS
+            )
+        except Exception as e:
+            logger.error(f"Error generating packed child nodes with Claude: {str(e)}", exc_info=True)
+            self._record_packed_call(time.monotonic() - started, False)
+            return children_by_parent
+        elapsed = time.monotonic() - started
+        
+        generated_count = 0
+        for entry in _parse_tool_output(GeneratedChildrenPayload, tool_output).parents:
+            parent = parents_by_id.get(entry.parent_id)
+            if parent is None or not entry.children:
+                continue
+            children_by_parent[parent.id] = self._build_child_nodes(
+                entry.children, parent.id, parent.label, max_children
+            )
+            self._store_children(cache_keys[parent.id], max_children, children_by_parent[parent.id])
+            generated_count += 1
+        
+        self._record_packed_call(elapsed, generated_count == len(parents))
+        logger.info(f"Packed child generation returned children for {generated_count}/{len(parents)} parents")
+        return children_by_parent
+    
+    async def expand_frontier(
+        self,
+        frontier: List[MindMapNode],
+        max_children: int = DEFAULT_MAX_CHILDREN
+    ) -> Dict[str, List[MindMapNode]]:
+        """
+        Generate children for every node on the current frontier of the mindmap.
+        
+        The frontier is packed into multi-parent calls of the current adaptive
+        size, run concurrently. Parents a packed response misses are expanded
+        individually.
+        
+        Args:
+            frontier: Leaf nodes to expand
+            max_children: Maximum number of children per node
+            
+        Returns:
+            Dictionary mapping frontier node IDs to their child nodes
+        """
+        # Bound the number of Claude calls in flight at once
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+        
+        async def generate_bounded(node: MindMapNode) -> List[MindMapNode]:
+            async with semaphore:
+                return await self.generate_child_nodes(
+                    node.id,
+                    node.content,
+                    node.label,
+                    max_children
+                )
+        
+        async def generate_chunk(chunk: List[MindMapNode]) -> Dict[str, List[MindMapNode]]:
+            async with semaphore:
+                children_by_parent = await self.generate_child_nodes_multi(chunk, max_children)
+            
+            # Fall back to individual calls for parents the packed response missed
+            missing = [node for node in chunk if node.id not in children_by_parent]
+            for node, children in zip(missing, await asyncio.gather(*(generate_bounded(n) for n in missing))):
+                children_by_parent[node.id] = children
+            return children_by_parent
+        
+        chunk_size = self._parents_per_request
+        chunks = [
+            frontier[i:i + chunk_size]
+            for i in range(0, len(frontier), chunk_size)
+        ]
+        results = await asyncio.gather(
+            *(generate_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        children_by_parent = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Unhandled error generating children for nodes {[n.id for n in chunk]}: {str(result)}")
+                # Continue with other nodes even if one chunk fails
+                continue
+            children_by_parent.update(result)
+        
+        return children_by_parent
+    
+    def _record_packed_call(self, elapsed: float, complete: bool) -> None:
+        """
+        Adapt the number of parents per packed call to observed performance.
+        
+        Grows by one while calls finish within PACKED_REQUEST_TARGET_SECONDS and
+        cover every parent; halves when a call is slow (including time spent in
+        rate-limit retries) or drops parents.
+        
+        Args:
+            elapsed: Wall-clock seconds the packed Claude call took
+            complete: Whether the response covered every parent sent to Claude
+        """
+        if complete and elapsed < PACKED_REQUEST_TARGET_SECONDS:
+            self._parents_per_request = min(self._parents_per_request + 1, MAX_PARENTS_PER_REQUEST)
+        else:
+            self._parents_per_request = max(self._parents_per_request // 2, 1)
+        logger.debug(f"Packed call took {elapsed:.1f}s (complete={complete}); parents per request now {self._parents_per_request}")
+    
+    async def generate_mindmap_levels(
+        self,
+        topic: str,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        max_children_per_node: int = DEFAULT_MAX_CHILDREN
+    ) -> AsyncIterator[List[MindMapNode]]:
+        """
+        Generate a mindmap level by level, yielding each level as soon as it is complete.
+        
+        Args:
+            topic: The main topic for the mindmap
+            max_depth: Maximum depth of the mindmap
+            max_children_per_node: Maximum children per node
+            
+        Yields:
+            The nodes of each level, starting with a list holding just the root node
+        """
+        # Generate the root node
+        root_node = await self.generate_root_node(topic)
+        logger.info(f"Added root node '{root_node.label}' (ID: {root_node.id}) to mindmap")
+        yield [root_node]
+        
+        # Process nodes level by level, generating all siblings concurrently
+        current_level_nodes = [root_node]  # Start with the root node at level 1
+        current_level = 1
+        
+        while current_level_nodes and current_level < max_depth:
+            logger.info(f"Generating children for {len(current_level_nodes)} nodes at level {current_level}")
+            
+            children_by_parent = await self.expand_frontier(
+                current_level_nodes,
+                max_children_per_node
+            )
+            
+            next_level_nodes = []
+            for node in current_level_nodes:
+                children = children_by_parent.get(node.id, [])
+                next_level_nodes.extend(children)
+                logger.debug(f"Added {len(children)} children to node {node.id}")
+            
+            if next_level_nodes:
+                yield next_level_nodes
+            current_level_nodes = next_level_nodes
+            current_level += 1
+    
     async def generate_mindmap_recursively(
         self,
         topic: str,
@@ -266,85 +809,20 @@ class MindMapService:
         all_nodes = []
         
         try:
-            # Generate the root node
-            root_node = await self.generate_root_node(topic)
-            all_nodes.append(root_node)
-            logger.info(f"Added root node '{root_node.label}' (ID: {root_node.id}) to mindmap")
-            
-            # Queue of nodes to process, with their level
-            nodes_to_process = [(root_node, 1)]  # Start with the root node at level 1
-            
-            # Process nodes level by level using BFS
-            while nodes_to_process:
-                current_node, current_level = nodes_to_process.pop(0)
-                logger.info(f"Processing node: '{current_node.label}' (ID: {current_node.id}) at level {current_level}")
-                
-                # Skip generating children if we've reached max depth
-                if current_level >= max_depth:
-                    logger.info(f"Reached max depth {max_depth} for node {current_node.id}. Skipping child generation.")
-                    continue
-                
-                logger.info(f"Generating children for node: '{current_node.label}' (ID: {current_node.id}) at level {current_level}")
-                
-                try:
-                    # Generate child nodes with retry mechanism
-                    retry_count = 0
-                    max_retries = 2
-                    child_nodes = []
-                    
-                    while retry_count <= max_retries and not child_nodes:
-                        try:
-                            # Generate child nodes
-                            child_nodes = await self.generate_child_nodes(
-                                current_node.id,
-                                current_node.content,
-                                current_node.label,
-                                max_children_per_node
-                            )
-                            
-                            if not child_nodes and retry_count < max_retries:
-                                logger.warning(f"No child nodes generated for {current_node.id} on attempt {retry_count+1}. Retrying...")
-                                retry_count += 1
-                            elif not child_nodes:
-                                logger.warning(f"Failed to generate child nodes for {current_node.id} after {max_retries+1} attempts")
-                                break
-                            
-                        except Exception as retry_error:
-                            logger.error(f"Error on attempt {retry_count+1} generating children for node {current_node.id}: {str(retry_error)}")
-                            if retry_count < max_retries:
-                                retry_count += 1
-                                logger.info(f"Retrying child generation for node {current_node.id} (Attempt {retry_count+1}/{max_retries+1})")
-                            else:
-                                logger.error(f"Exhausted retries for node {current_node.id}")
-                                break
-                    
-                    # Add child nodes to the full list and queue
-                    for child_node in child_nodes:
-                        all_nodes.append(child_node)
-                        # Add to processing queue for next level
-                        nodes_to_process.append((child_node, current_level + 1))
-                        
-                    logger.info(f"Added {len(child_nodes)} children to node {current_node.id}")
-                    
-                except Exception as e:
-                    logger.error(f"Unhandled error generating children for node {current_node.id}: {str(e)}", exc_info=True)
-                    # Continue with other nodes even if one fails
-                    continue
+            async for level_nodes in self.generate_mindmap_levels(
+                topic,
+                max_depth,
+                max_children_per_node
+            ):
+                all_nodes.extend(level_nodes)
             
             logger.info(f"Completed recursive mindmap generation with {len(all_nodes)} total nodes")
             
             # Add level information for better logging
-            for node in all_nodes:
-                level = 0
-                parent_id = node.parent_id
-                
-                # Determine level by walking up the tree
-                while parent_id:
-                    level += 1
-                    parent_node = next((n for n in all_nodes if n.id == parent_id), None)
-                    parent_id = parent_node.parent_id if parent_node else None
-                
-                logger.debug(f"Node '{node.label}' (ID: {node.id}) is at level {level}")
+            if logger.isEnabledFor(logging.DEBUG):
+                node_levels = _compute_node_levels(all_nodes)
+                for node in all_nodes:
+                    logger.debug(f"Node '{node.label}' (ID: {node.id}) is at level {node_levels[node.id]}")
             
             return all_nodes
             
@@ -358,12 +836,7 @@ class MindMapService:
                 
             # Otherwise create and return just a root node
             logger.warning("Creating default root node due to error")
-            return [MindMapNode(
-                id="1",
-                label=topic,
-                content=f"Overview of {topic}: A comprehensive exploration of this subject and its key aspects.",
-                parent_id=None
-            )]
+            return [_default_root(topic)]
     
     def convert_to_react_flow_format(self, mindmap_nodes: List[MindMapNode]) -> Dict[str, Any]:
         """
@@ -377,70 +850,47 @@ class MindMapService:
         """
         logger.info(f"Converting {len(mindmap_nodes)} mindmap nodes to React Flow format")
         
-        nodes = []
-        edges = []
-        
         # Position calculation variables
         levels = {}  # Keep track of nodes at each level
-        level_counts = {}  # Count nodes at each level
         
         # First pass: group nodes by level
         logger.info("Organizing nodes by level")
+        node_levels = _compute_node_levels(mindmap_nodes)
         for node in mindmap_nodes:
-            level = 0
-            parent_id = node.parent_id
-            
-            # Determine level by walking up the tree
-            while parent_id:
-                level += 1
-                parent_node = next((n for n in mindmap_nodes if n.id == parent_id), None)
-                parent_id = parent_node.parent_id if parent_node else None
-            
-            # Initialize level lists if needed
-            if level not in levels:
-                levels[level] = []
-                level_counts[level] = 0
-            
-            # Add node to appropriate level
-            levels[level].append(node)
-            level_counts[level] += 1
+            levels.setdefault(node_levels[node.id], []).append(node)
         
         logger.info(f"Nodes organized into {len(levels)} levels")
         
         # Second pass: assign positions and create React Flow nodes
         logger.info("Assigning positions and creating React Flow nodes")
-        for level, nodes_at_level in levels.items():
-            level_width = len(nodes_at_level)
-            logger.debug(f"Processing level {level} with {level_width} nodes")
-            
-            for i, node in enumerate(nodes_at_level):
-                # Calculate position
-                x_pos = (i - level_width / 2) * 250  # Horizontal spacing
-                y_pos = level * 200  # Vertical spacing
-                
-                # Create React Flow node
-                rf_node = {
-                    "id": node.id,
-                    "type": "mindmap",
-                    "position": {"x": x_pos, "y": y_pos},
-                    "data": {
-                        "label": node.label,
-                        "content": node.content,
-                        "status": "not_started" if level == 0 else "locked"  # Only root is not_started
-                    }
+        nodes = [
+            {
+                "id": node.id,
+                "type": "mindmap",
+                "position": {"x": (i - level_width / 2) * 250, "y": level * 200},
+                "data": {
+                    "label": node.label,
+                    "content": node.content,
+                    "status": "not_started" if level == 0 else "locked"  # Only root is not_started
                 }
-                nodes.append(rf_node)
-                
-                # Create edge if node has a parent
-                if node.parent_id:
-                    edge_id = f"e-{node.parent_id}-{node.id}"
-                    edge = {
-                        "id": edge_id,
-                        "source": node.parent_id,
-                        "target": node.id,
-                        "type": "mindmap"
-                    }
-                    edges.append(edge)
+            }
+            for level, nodes_at_level in levels.items()
+            for level_width in (len(nodes_at_level),)
+            for i, node in enumerate(nodes_at_level)
+        ]
+        
+        # Create an edge for every node with a parent
+        edges = [
+            {
+                "id": f"e-{node.parent_id}-{node.id}",
+                "source": node.parent_id,
+                "target": node.id,
+                "type": "mindmap"
+            }
+            for nodes_at_level in levels.values()
+            for node in nodes_at_level
+            if node.parent_id
+        ]
         
         logger.info(f"Successfully created React Flow format with {len(nodes)} nodes and {len(edges)} edges")
         
@@ -464,17 +914,9 @@ class MindMapService:
         Returns:
             List of position dictionaries with x and y coordinates
         """
-        positions = []
-        
-        # Position the children below the parent in a semi-circle
-        for i in range(child_count):
-            # Calculate position - spread evenly in a semi-circle below parent
-            angle = math.pi * (i / (child_count - 1) if child_count > 1 else 0.5)
-            radius = 250  # Distance from parent
-            
-            x_pos = parent_position["x"] + radius * math.cos(angle)
-            y_pos = parent_position["y"] + 200 + (radius * math.sin(angle) * 0.5)
-            
-            positions.append({"x": x_pos, "y": y_pos})
-        
-        return positions 
\ No newline at end of file
+        parent_x = parent_position["x"]
+        parent_y = parent_position["y"]
+        return [
+            {"x": parent_x + x_offset, "y": parent_y + y_offset}
+            for x_offset, y_offset in _semicircle_offsets(child_count)
+        ]
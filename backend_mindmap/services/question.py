@@ -1,15 +1,141 @@
 """Service for generating and evaluating questions."""
 import logging
-import json
-from typing import Dict, List, Any, Optional
+import orjson
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 from ..models.schema import Question, NodeStatus
+from ..config.settings import GENERATION_CACHE_MAX_ENTRIES, PROMPT_CONTENT_TOKEN_BUDGET
+from ..utils.helpers import content_cache_key, truncate_to_token_budget
 from .anthropic import AnthropicService
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Static instructions are sent as system prompts, separate from the node-specific details
+QUESTIONS_SYSTEM_PROMPT = """You are an educational assessment expert creating open-ended questions that test knowledge about a topic.
+
+Guidelines:
+- Questions should test deep understanding, not just recall
+- Questions should be answerable from the provided content
+- Questions should encourage critical thinking
+- Include a variety of difficulty levels
+
+Format your response as a JSON array of questions with this structure:
+[
+  {
+    "text": "Your first question here?"
+  },
+  {
+    "text": "Your second question here?"
+  }
+]
+
+Only return the valid JSON array, nothing else."""
+
+EVALUATION_SYSTEM_PROMPT = """You are an expert educational evaluator. Your task is to evaluate a student's answer to a question about a specific topic.
+
+First, evaluate the student's answer. Consider:
+- Is the answer factually correct?
+- Does it demonstrate understanding of the topic?
+- Is it complete?
+- Does it show critical thinking?
+
+Then, assign a grade from 0 to 100 where:
+- 0-60: Poor understanding
+- 61-79: Partial understanding
+- 80-89: Good understanding
+- 90-100: Excellent understanding
+
+Provide your feedback as a JSON object with this structure:
+{
+  "feedback": "Your detailed feedback here, explaining strengths and weaknesses of the answer, and how it could be improved.",
+  "grade": 85,
+  "passed": true
+}
+
+The "passed" field should be true if the grade is 80 or above, false otherwise.
+Only return the valid JSON object, nothing else."""
+
+
+# Per-request prompt templates, formatted with only the node-specific fields
+_QUESTIONS_PROMPT = """Create questions to test knowledge about: "{node_label}".
+
+Here is the content about this topic:
+"{node_content}"
+
+{related_topics}
+Based on this content, create 1-3 open-ended questions that test understanding of "{node_label}"."""
+
+_RELATED_TOPIC_LINE = "- {label}: {content}\n"
+
+_EVALUATION_PROMPT = """Topic content: "{node_content}"
+
+Question: "{question}"
+
+Student's answer: "{answer}"
+"""
+
+
+def _extract_json(text: str, opening: str) -> str:
+    """
+    Slice the first complete JSON array or object out of text.
+    
+    Args:
+        text: Model output that may wrap the JSON in extra prose
+        opening: The expected opening bracket, "[" for an array or "{" for an object
+        
+    Returns:
+        The bracketed JSON substring, or the original text if none is found
+    """
+    start = text.find(opening)
+    if start == -1:
+        return text
+    closing = "]" if opening == "[" else "}"
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    
+    return text[start:]
+
+
+def _parse_json(text: str, opening: str) -> Any:
+    """
+    Parse JSON from model output, repairing surrounding prose if needed.
+    
+    Args:
+        text: Model output expected to contain JSON
+        opening: The expected opening bracket, "[" for an array or "{" for an object
+        
+    Returns:
+        The parsed JSON value
+        
+    Raises:
+        orjson.JSONDecodeError: If no valid JSON can be recovered
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return orjson.loads(_extract_json(text, opening))
+
 
 class QuestionService:
     """Service for generating and evaluating questions about nodes."""
@@ -17,6 +143,8 @@ class QuestionService:
     def __init__(self, anthropic_service: AnthropicService):
         """Initialize with a reference to the Anthropic service."""
         self.anthropic = anthropic_service
+        # Generated question texts keyed by a hash of the node's label and content
+        self._question_cache: Dict[str, List[str]] = {}
     
     async def generate_questions(
         self,
@@ -39,7 +167,14 @@ class QuestionService:
         """
         logger.info(f"Generating questions for node: {node_label}")
         
-        prompt = self._generate_questions_prompt(
+        # Reuse questions generated earlier for the same node content
+        cache_key = content_cache_key(node_label, node_content)
+        cached_texts = self._question_cache.get(cache_key)
+        if cached_texts is not None:
+            logger.info(f"Using cached questions for node: {node_label}")
+            return [Question(text=text) for text in cached_texts]
+        
+        system_prompt, prompt = self._generate_questions_prompt(
             node_content,
             node_label,
             parent_nodes,
@@ -47,11 +182,11 @@ class QuestionService:
         )
         
         # Use the anthropic service to generate questions
-        response_text = await self.anthropic.generate_text(prompt)
+        response_text = await self.anthropic.generate_text(prompt, system=system_prompt)
         
         try:
             # Parse the JSON response
-            questions_data = json.loads(response_text)
+            questions_data = _parse_json(response_text, "[")
             
             # Create Question objects
             questions = []
@@ -61,10 +196,14 @@ class QuestionService:
                 )
                 questions.append(question)
             
+            if len(self._question_cache) >= GENERATION_CACHE_MAX_ENTRIES:
+                self._question_cache.pop(next(iter(self._question_cache)))
+            self._question_cache[cache_key] = [question.text for question in questions]
+            
             logger.info(f"Generated {len(questions)} questions for node: {node_label}")
             return questions
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error(f"Failed to parse questions JSON: {response_text}")
             # Fallback to a default question
             default_question = Question(
@@ -78,6 +217,16 @@ class QuestionService:
             )
             return [default_question]
     
+    def forget_questions(self, node_label: str, node_content: str) -> None:
+        """
+        Drop cached questions for a node so the next generation calls Claude again.
+        
+        Args:
+            node_label: The label of the node
+            node_content: The content of the node
+        """
+        self._question_cache.pop(content_cache_key(node_label, node_content), None)
+    
     async def evaluate_answer(
         self,
         question: str,
@@ -104,16 +253,18 @@ class QuestionService:
         )
         
         # Use the anthropic service to evaluate the answer
-        response_text = await self.anthropic.generate_text(prompt)
+        response_text = await self.anthropic.generate_text(prompt, system=EVALUATION_SYSTEM_PROMPT)
         
         try:
             # Parse the JSON response
-            evaluation = json.loads(response_text)
+            evaluation = _parse_json(response_text, "{")
+            if not isinstance(evaluation, dict):
+                raise ValueError(f"Expected a JSON object, got {type(evaluation).__name__}")
             
             logger.info(f"Answer evaluated. Grade: {evaluation.get('grade')}, Passed: {evaluation.get('passed')}")
             return evaluation
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error(f"Failed to parse evaluation JSON: {response_text}")
             # Return a default evaluation
             return {
@@ -135,9 +286,9 @@ class QuestionService:
         node_label: str,
         parent_nodes: List[Dict[str, str]],
         child_nodes: List[Dict[str, str]]
-    ) -> str:
+    ) -> Tuple[str, str]:
         """
-        Generate a prompt for Claude to create questions about a node.
+        Generate the prompts for Claude to create questions about a node.
         
         Args:
             node_content: The content of the node
@@ -146,50 +297,28 @@ class QuestionService:
             child_nodes: List of child node data
             
         Returns:
-            Prompt string for Claude
-        """
-        context = f"""
-        You are an educational assessment expert creating questions to test knowledge about: "{node_label}".
-        
-        Here is the content about this topic:
-        "{node_content}"
-        
+            Tuple of the system prompt and the node-specific user prompt
         """
-        
+        related_topics = ""
         if parent_nodes:
-            context += "This topic is related to the following parent topics:\n"
-            for node in parent_nodes:
-                context += f"- {node.get('label', 'Unknown')}: {node.get('content', 'No content')}\n"
+            related_topics += "This topic is related to the following parent topics:\n" + "".join(
+                _RELATED_TOPIC_LINE.format(label=node.get('label', 'Unknown'), content=node.get('content', 'No content'))
+                for node in parent_nodes
+            )
         
         if child_nodes:
-            context += "This topic has the following subtopics:\n"
-            for node in child_nodes:
-                context += f"- {node.get('label', 'Unknown')}: {node.get('content', 'No content')}\n"
-        
-        prompt = f"""{context}
-
-        Based on this content, create 1-3 open-ended questions that test understanding of "{node_label}".
-        
-        Guidelines:
-        - Questions should test deep understanding, not just recall
-        - Questions should be answerable from the provided content
-        - Questions should encourage critical thinking
-        - Include a variety of difficulty levels
-        
-        Format your response as a JSON array of questions with this structure:
-        [
-          {{
-            "text": "Your first question here?"
-          }},
-          {{
-            "text": "Your second question here?"
-          }}
-        ]
-        
-        Only return the valid JSON array, nothing else.
-        """
+            related_topics += "This topic has the following subtopics:\n" + "".join(
+                _RELATED_TOPIC_LINE.format(label=node.get('label', 'Unknown'), content=node.get('content', 'No content'))
+                for node in child_nodes
+            )
         
-        return prompt
+        prompt = _QUESTIONS_PROMPT.format(
+            node_label=node_label,
+            node_content=truncate_to_token_budget(node_content, PROMPT_CONTENT_TOKEN_BUDGET),
+            related_topics=related_topics
+        )
+        
+        return QUESTIONS_SYSTEM_PROMPT, prompt
     
     def _evaluate_answer_prompt(
         self,
@@ -198,7 +327,9 @@ class QuestionService:
         node_content: str
     ) -> str:
         """
-        Generate a prompt for Claude to evaluate a user's answer.
+        Generate the node-specific prompt for Claude to evaluate a user's answer.
+        
+        The grading rubric lives in EVALUATION_SYSTEM_PROMPT.
         
         Args:
             question: The question text
@@ -208,36 +339,10 @@ class QuestionService:
         Returns:
             Prompt string for Claude
         """
-        prompt = f"""
-        You are an expert educational evaluator. Your task is to evaluate a student's answer to a question about a specific topic.
-        
-        Topic content: "{node_content}"
-        
-        Question: "{question}"
-        
-        Student's answer: "{answer}"
-        
-        First, evaluate the student's answer. Consider:
-        - Is the answer factually correct?
-        - Does it demonstrate understanding of the topic?
-        - Is it complete?
-        - Does it show critical thinking?
-        
-        Then, assign a grade from 0 to 100 where:
-        - 0-60: Poor understanding
-        - 61-79: Partial understanding
-        - 80-89: Good understanding
-        - 90-100: Excellent understanding
-        
-        Provide your feedback as a JSON object with this structure:
-        {{
-          "feedback": "Your detailed feedback here, explaining strengths and weaknesses of the answer, and how it could be improved.",
-          "grade": 85,
-          "passed": true
-        }}
-        
-        The "passed" field should be true if the grade is 80 or above, false otherwise.
-        Only return the valid JSON object, nothing else.
-        """
+        prompt = _EVALUATION_PROMPT.format(
+            node_content=node_content,
+            question=question,
+            answer=answer
+        )
         
-        return prompt 
\ No newline at end of file
+        return prompt
@@ -1,15 +1,18 @@
 """Service for managing session data and operations."""
 import logging
-from typing import Dict, List, Optional, Any, Set
-from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Any, Set
+from datetime import datetime, timezone
 
-from ..models.schema import NodeStatus, NodeInfo, EdgeInfo, SessionData
+from ..models.schema import NodeStatus, NodeInfo, EdgeInfo, NodeRelationships, SessionData
 from ..storage.base import BaseStorage
-from ..utils.helpers import build_node_relationships, check_node_unlockable, check_children_completed
+from ..utils.helpers import build_node_relationships, check_node_unlockable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Statuses a node can be set to
+VALID_NODE_STATUSES = frozenset(('not_started', 'in_progress', 'completed', 'locked'))
+
 
 class SessionService:
     """Service for managing session data and operations."""
@@ -48,44 +51,52 @@ class SessionService:
             # Get session data
             session = await self.storage.get_session_data(session_id)
             
-            # Store the graph nodes
+            # Store the graph nodes, binding the session's dicts once for the loop
+            graph_nodes = session.graph_nodes
+            session_nodes = session.nodes
             for node in nodes:
                 node_id = node["id"]
+                data = node.get("data") or {}
                 
                 # Create NodeInfo object
-                node_info = NodeInfo(
+                graph_nodes[node_id] = NodeInfo(
                     id=node_id,
-                    label=node.get("data", {}).get("label", ""),
-                    content=node.get("data", {}).get("content", ""),
+                    label=data.get("label", ""),
+                    content=data.get("content", ""),
                     position=node.get("position", {}),
                     type="mindmap"
                 )
-                session.graph_nodes[node_id] = node_info
                 
                 # Initialize node status if it doesn't exist
-                if node_id not in session.nodes:
-                    node_status = NodeStatus(
+                if node_id not in session_nodes:
+                    session_nodes[node_id] = NodeStatus(
                         node_id=node_id,
-                        status=node.get("data", {}).get("status", "locked"),
+                        status=data.get("status", "locked"),
                         questions=[],
                         unlockable=False
                     )
-                    session.nodes[node_id] = node_status
             
-            # Store edges as EdgeInfo objects
-            session.graph_edges = []
+            # Store edges as EdgeInfo objects, collecting (source, target) pairs in the same pass
+            graph_edges = session.graph_edges = []
+            edge_ids = session.graph_edge_ids = set()
+            edge_pairs = []
             for edge in edges:
-                edge_info = EdgeInfo(
-                    id=edge["id"],
-                    source=edge["source"],
-                    target=edge["target"],
+                edge_id = edge["id"]
+                if edge_id in edge_ids:
+                    continue
+                source = edge["source"]
+                target = edge["target"]
+                graph_edges.append(EdgeInfo(
+                    id=edge_id,
+                    source=source,
+                    target=target,
                     type="mindmap"
-                )
-                session.graph_edges.append(edge_info)
+                ))
+                edge_ids.add(edge_id)
+                edge_pairs.append((source, target))
             
             # Build relationships map for efficient access
-            edge_dicts = [{"source": edge["source"], "target": edge["target"]} for edge in edges]
-            session.relationships = build_node_relationships(edge_dicts)
+            session.relationships = NodeRelationships(**build_node_relationships(edge_pairs))
             
             # Save the session data
             success = await self.storage.save_session_data(session_id, session)
@@ -101,52 +112,146 @@ class SessionService:
             logger.error(f"Error initializing session: {str(e)}", exc_info=True)
             return False
     
-    async def check_node_unlockability(self, session_id: str, node_id: str) -> Dict[str, Any]:
+    def _batch_unlockability(self, session: SessionData, node_ids: List[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Check if a node is unlockable based on its parent nodes' completion status.
+        Check unlockability for several nodes, evaluating each node only once per call.
+        
+        Args:
+            session: The session data
+            node_ids: The node identifiers to check
+            
+        Returns:
+            Dictionary mapping node IDs to their check_node_unlockable results
+        """
+        # Read parents and statuses straight from the session instead of copying them
+        parents = session.relationships.parents
+        nodes = session.nodes
+        
+        def parents_of(node_id: str) -> Iterable[str]:
+            return parents.get(node_id, ())
+        
+        def status_of(node_id: str) -> Optional[str]:
+            node_status = nodes.get(node_id)
+            return node_status.status if node_status is not None else None
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        for node_id in node_ids:
+            if node_id not in results:
+                results[node_id] = check_node_unlockable(node_id, parents_of, status_of)
+        return results
+    
+    async def _save_unlockability(
+        self,
+        session_id: str,
+        session: SessionData,
+        results: Dict[str, Dict[str, Any]]
+    ) -> bool:
+        """
+        Store unlockability results on the session's nodes with a single write.
         
         Args:
             session_id: The session identifier
-            node_id: The node identifier to check
+            session: The session data
+            results: Dictionary mapping node IDs to their check_node_unlockable results
             
         Returns:
-            Dictionary with unlockable status and incomplete prerequisites
+            True if successful, False otherwise
+        """
+        updated = {}
+        for node_id, result in results.items():
+            node_status = session.nodes.get(node_id)
+            if node_status is not None:
+                node_status.unlockable = result["unlockable"]
+                updated[node_id] = node_status
+        
+        if not updated:
+            return True
+        
+        success = await self.storage.update_node_statuses_bulk(session_id, updated, session=session)
+        if not success:
+            logger.error(f"Failed to save unlockability for {len(updated)} nodes in session {session_id}")
+        return success
+    
+    async def refresh_unlockability(
+        self,
+        session_id: str,
+        node_ids: List[str],
+        session: Optional[SessionData] = None
+    ) -> bool:
+        """
+        Recompute and save the unlockable flag of several nodes.
+        
+        Args:
+            session_id: The session identifier
+            node_ids: The node identifiers to refresh
+            session: The session's data if the caller already loaded it, to skip a re-fetch
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            if session is None:
+                session = await self.storage.get_session_data(session_id)
+            return await self._save_unlockability(session_id, session, self._batch_unlockability(session, node_ids))
+        except Exception as e:
+            logger.error(f"Error refreshing node unlockability: {str(e)}", exc_info=True)
+            return False
+    
+    async def check_nodes_unlockability(self, session_id: str, node_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Check if several nodes are unlockable based on their parent nodes' completion status.
+        
+        Args:
+            session_id: The session identifier
+            node_ids: The node identifiers to check
+            
+        Returns:
+            Dictionary mapping node IDs to their unlockable status and incomplete prerequisites
         """
         try:
             # Get session data
             session = await self.storage.get_session_data(session_id)
             
-            # Extract edge data
-            edges = [{"source": e.source, "target": e.target} for e in session.graph_edges]
+            # Check every node against the precomputed parent relationships
+            results = self._batch_unlockability(session, node_ids)
             
-            # Create a map of node IDs to their statuses
-            node_statuses = {
-                node_id: node_data.status
-                for node_id, node_data in session.nodes.items()
-            }
-            
-            # Check if the node is unlockable
-            result = check_node_unlockable(node_id, edges, node_statuses)
-            
-            # Update the node's unlockable status in the session
-            if node_id in session.nodes:
-                session.nodes[node_id].unlockable = result["unlockable"]
-                await self.storage.update_node_status(session_id, node_id, session.nodes[node_id])
+            # Update the nodes' unlockable status in the session with a single write
+            await self._save_unlockability(session_id, session, results)
             
             return {
-                "unlockable": result["unlockable"],
-                "reason": "Node is unlockable" if result["unlockable"] else "Prerequisites not completed",
-                "incomplete_prerequisites": result.get("prerequisites_pending", [])
+                node_id: {
+                    "unlockable": result["unlockable"],
+                    "reason": "Node is unlockable" if result["unlockable"] else "Prerequisites not completed",
+                    "incomplete_prerequisites": result.get("prerequisites_pending", [])
+                }
+                for node_id, result in results.items()
             }
             
         except Exception as e:
             logger.error(f"Error checking node unlockability: {str(e)}", exc_info=True)
             return {
-                "unlockable": False,
-                "reason": f"Error: {str(e)}",
-                "incomplete_prerequisites": []
+                node_id: {
+                    "unlockable": False,
+                    "reason": f"Error: {str(e)}",
+                    "incomplete_prerequisites": []
+                }
+                for node_id in node_ids
             }
     
+    async def check_node_unlockability(self, session_id: str, node_id: str) -> Dict[str, Any]:
+        """
+        Check if a node is unlockable based on its parent nodes' completion status.
+        
+        Args:
+            session_id: The session identifier
+            node_id: The node identifier to check
+            
+        Returns:
+            Dictionary with unlockable status and incomplete prerequisites
+        """
+        results = await self.check_nodes_unlockability(session_id, [node_id])
+        return results[node_id]
+    
     async def update_node_status(self, session_id: str, node_id: str, status: str) -> bool:
         """
         Update the status of a node.
@@ -158,43 +263,68 @@ class SessionService:
             
         Returns:
             True if successful, False otherwise
+            
+        Raises:
+            ValueError: If the status is invalid
+            KeyError: If the node is not in the session
+        """
+        return await self.update_node_statuses(session_id, {node_id: status})
+    
+    async def update_node_statuses(self, session_id: str, statuses: Dict[str, str]) -> bool:
+        """
+        Update the status of several nodes with a single storage write.
+        
+        Nothing is written if any status is invalid or any node is missing.
+        
+        Args:
+            session_id: The session identifier
+            statuses: Dictionary mapping node IDs to their new status
+            
+        Returns:
+            True if successful, False otherwise
+            
+        Raises:
+            ValueError: If any status is invalid
+            KeyError: If any node is not in the session
         """
         try:
-            valid_statuses = ['not_started', 'in_progress', 'completed', 'locked']
-            if status not in valid_statuses:
-                logger.error(f"Invalid status: {status}")
-                return False
+            invalid = [f"{node_id}={status}" for node_id, status in statuses.items() if status not in VALID_NODE_STATUSES]
+            if invalid:
+                raise ValueError(f"Invalid status: {', '.join(invalid)}")
             
             # Get session data
             session = await self.storage.get_session_data(session_id)
             
-            # Update the node status
-            if node_id in session.nodes:
+            missing = [node_id for node_id in statuses if node_id not in session.nodes]
+            if missing:
+                raise KeyError(f"Nodes not found in session {session_id}: {', '.join(missing)}")
+            
+            # Update the node statuses, stamping the whole batch with one timestamp
+            current_time = datetime.now(timezone.utc)
+            updated = {}
+            for node_id, status in statuses.items():
                 node_status = session.nodes[node_id]
-                
-                # Update the status
                 node_status.status = status
-                current_time = datetime.utcnow()
                 
                 # Add timestamp for status changes
                 if status == "completed" and not node_status.completed_at:
                     node_status.completed_at = current_time
                 elif status == "in_progress" and not node_status.started_at:
                     node_status.started_at = current_time
-                
-                # Save the updated status
-                success = await self.storage.update_node_status(session_id, node_id, node_status)
-                
-                if success:
-                    logger.info(f"Node status updated: {session_id}/{node_id} -> {status}")
-                else:
-                    logger.error(f"Failed to update node status for {session_id}/{node_id}")
-                
-                return success
+                updated[node_id] = node_status
+            
+            # Save the updated statuses
+            success = await self.storage.update_node_statuses_bulk(session_id, updated, session=session)
+            
+            if success:
+                logger.info(f"Node statuses updated: {session_id} -> {statuses}")
             else:
-                logger.error(f"Node {node_id} not found in session {session_id}")
-                return False
+                logger.error(f"Failed to update node statuses for {session_id}")
+            
+            return success
                 
+        except (ValueError, KeyError):
+            raise
         except Exception as e:
             logger.error(f"Error updating node status: {str(e)}", exc_info=True)
             return False
@@ -225,13 +355,10 @@ class SessionService:
             # Get progress data if it exists
             progress_data = session.nodes.get(node_id, None)
             
-            # Get related nodes
-            children = list(session.relationships.children.get(node_id, set()))
-            parents = list(session.relationships.parents.get(node_id, set()))
-            
-            # Get child and parent node data
-            child_nodes = [session.graph_nodes.get(child_id, {"id": child_id}) for child_id in children]
-            parent_nodes = [session.graph_nodes.get(parent_id, {"id": parent_id}) for parent_id in parents]
+            # Get child and parent node data straight from the relationship sets
+            graph_nodes = session.graph_nodes
+            child_nodes = [graph_nodes.get(child_id) or {"id": child_id} for child_id in session.relationships.children.get(node_id, ())]
+            parent_nodes = [graph_nodes.get(parent_id) or {"id": parent_id} for parent_id in session.relationships.parents.get(node_id, ())]
             
             # Combine all data
             result = {
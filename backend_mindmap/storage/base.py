@@ -38,7 +38,13 @@ class BaseStorage(ABC):
         pass
     
     @abstractmethod
-    async def update_node_status(self, session_id: str, node_id: str, status: NodeStatus) -> bool:
+    async def update_node_status(
+        self,
+        session_id: str,
+        node_id: str,
+        status: NodeStatus,
+        session: Optional[SessionData] = None
+    ) -> bool:
         """
         Update a node's status in a session.
         
@@ -46,6 +52,27 @@ class BaseStorage(ABC):
             session_id: The unique session identifier
             node_id: The node identifier
             status: New NodeStatus object
+            session: The session's data if the caller already loaded it, to skip a re-fetch
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        pass
+    
+    @abstractmethod
+    async def update_node_statuses_bulk(
+        self,
+        session_id: str,
+        statuses: Dict[str, NodeStatus],
+        session: Optional[SessionData] = None
+    ) -> bool:
+        """
+        Update several nodes' statuses in a session with a single write.
+        
+        Args:
+            session_id: The unique session identifier
+            statuses: Dictionary mapping node IDs to their new NodeStatus objects
+            session: The session's data if the caller already loaded it, to skip a re-fetch
             
         Returns:
             True if successful, False otherwise
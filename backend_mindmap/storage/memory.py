@@ -1,9 +1,11 @@
 """In-memory storage implementation."""
 import logging
+from collections import OrderedDict
 from typing import Dict, Optional, Any, List, Set
-from datetime import datetime
+from datetime import datetime, timezone
 
 from .base import BaseStorage
+from ..config.settings import MAX_SESSIONS
 from ..models.schema import (
     NodeStatus, NodeInfo, EdgeInfo, NodeRelationships, SessionData
 )
@@ -14,9 +16,10 @@ logger = logging.getLogger(__name__)
 class MemoryStorage(BaseStorage):
     """In-memory storage for session data using dictionaries."""
     
-    def __init__(self):
-        """Initialize the in-memory storage."""
-        self.sessions: Dict[str, SessionData] = {}
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        """Initialize the in-memory storage, keeping at most max_sessions sessions."""
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, SessionData]" = OrderedDict()
     
     async def get_session_data(self, session_id: str) -> SessionData:
         """
@@ -31,10 +34,26 @@ class MemoryStorage(BaseStorage):
         # If session doesn't exist, create a new one
         if session_id not in self.sessions:
             logger.info(f"Creating new session: {session_id}")
-            self.sessions[session_id] = SessionData()
+            self._store_session(session_id, SessionData())
+        else:
+            self.sessions.move_to_end(session_id)
         
         return self.sessions[session_id]
     
+    def _store_session(self, session_id: str, data: SessionData) -> None:
+        """
+        Store a session as the most recently used, evicting the least recently used one when full.
+        
+        Args:
+            session_id: The unique session identifier
+            data: SessionData object to store
+        """
+        self.sessions[session_id] = data
+        self.sessions.move_to_end(session_id)
+        if len(self.sessions) > self.max_sessions:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            logger.info(f"Evicted least recently used session: {evicted_id}")
+    
     async def save_session_data(self, session_id: str, data: SessionData) -> bool:
         """
         Save session data for a given session ID.
@@ -47,14 +66,20 @@ class MemoryStorage(BaseStorage):
             True if successful, False otherwise
         """
         try:
-            self.sessions[session_id] = data
+            self._store_session(session_id, data)
             logger.info(f"Session data saved: {session_id}")
             return True
         except Exception as e:
             logger.error(f"Error saving session data: {str(e)}")
             return False
     
-    async def update_node_status(self, session_id: str, node_id: str, status: NodeStatus) -> bool:
+    async def update_node_status(
+        self,
+        session_id: str,
+        node_id: str,
+        status: NodeStatus,
+        session: Optional[SessionData] = None
+    ) -> bool:
         """
         Update a node's status in a session.
         
@@ -62,12 +87,14 @@ class MemoryStorage(BaseStorage):
             session_id: The unique session identifier
             node_id: The node identifier
             status: New NodeStatus object
+            session: The session's data if the caller already loaded it, to skip a re-fetch
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            session = await self.get_session_data(session_id)
+            if session is None:
+                session = await self.get_session_data(session_id)
             session.nodes[node_id] = status
             logger.info(f"Node status updated: {session_id}/{node_id} -> {status.status}")
             return True
@@ -75,6 +102,33 @@ class MemoryStorage(BaseStorage):
             logger.error(f"Error updating node status: {str(e)}")
             return False
     
+    async def update_node_statuses_bulk(
+        self,
+        session_id: str,
+        statuses: Dict[str, NodeStatus],
+        session: Optional[SessionData] = None
+    ) -> bool:
+        """
+        Update several nodes' statuses in a session with a single write.
+        
+        Args:
+            session_id: The unique session identifier
+            statuses: Dictionary mapping node IDs to their new NodeStatus objects
+            session: The session's data if the caller already loaded it, to skip a re-fetch
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            if session is None:
+                session = await self.get_session_data(session_id)
+            session.nodes.update(statuses)
+            logger.info(f"Node statuses updated: {session_id} ({len(statuses)} nodes)")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating node statuses: {str(e)}")
+            return False
+    
     async def update_node_info(self, session_id: str, node_id: str, info: NodeInfo) -> bool:
         """
         Update a node's information in a session.
@@ -110,21 +164,16 @@ class MemoryStorage(BaseStorage):
         try:
             session = await self.get_session_data(session_id)
             
+            # Index edge IDs on first use so the existence check is a set lookup
+            if not session.graph_edge_ids and session.graph_edges:
+                session.graph_edge_ids = {e.id for e in session.graph_edges}
+            
             # Check if edge already exists
-            edge_exists = any(e.id == edge.id for e in session.graph_edges)
-            if not edge_exists:
+            if edge.id not in session.graph_edge_ids:
                 session.graph_edges.append(edge)
+                session.graph_edge_ids.add(edge.id)
                 
                 # Update relationships
-                if edge.source not in session.relationships.parents:
-                    session.relationships.parents[edge.source] = set()
-                if edge.target not in session.relationships.children:
-                    session.relationships.children[edge.target] = set()
-                if edge.target not in session.relationships.parents:
-                    session.relationships.parents[edge.target] = set()
-                if edge.source not in session.relationships.children:
-                    session.relationships.children[edge.source] = set()
-                
                 session.relationships.parents[edge.target].add(edge.source)
                 session.relationships.children[edge.source].add(edge.target)
                 
@@ -174,6 +223,7 @@ class MemoryStorage(BaseStorage):
         Returns:
             Chat history data
         """
+        now = datetime.now(timezone.utc)
         try:
             session = await self.get_session_data(session_id)
             
@@ -186,8 +236,8 @@ class MemoryStorage(BaseStorage):
                 session.chat_history[node_id] = {
                     "node_id": node_id,
                     "messages": [],
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
+                    "created_at": now,
+                    "updated_at": now
                 }
             
             return session.chat_history[node_id]
@@ -196,6 +246,6 @@ class MemoryStorage(BaseStorage):
             return {
                 "node_id": node_id,
                 "messages": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "created_at": now,
+                "updated_at": now
             } 
\ No newline at end of file
@@ -1,109 +1,97 @@
 """Helper utility functions for the mindmap backend."""
+import hashlib
 import logging
-from typing import Dict, List, Set, Any, Optional
+from collections import defaultdict
+from typing import Callable, DefaultDict, Dict, Iterable, Set, Any, Optional, Tuple
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-def build_node_relationships(edges: List[Dict[str, str]]) -> Dict[str, Dict[str, Set[str]]]:
+def content_cache_key(*parts: Any) -> str:
     """
-    Build a relationships map from a list of edges.
+    Build a stable cache key from the given values.
     
     Args:
-        edges: List of edge dictionaries with source and target
+        parts: Values identifying the cached result
         
     Returns:
-        Dictionary with parent and child relationships
+        Hex digest of the joined values
+    """
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def truncate_to_token_budget(text: str, max_tokens: int) -> str:
     """
-    relationships = {
-        "parents": {},  # target -> set of sources
-        "children": {}  # source -> set of targets
-    }
+    Truncate text to roughly max_tokens tokens, cutting at a word boundary.
     
-    for edge in edges:
-        source = edge.get("source")
-        target = edge.get("target")
-        
-        if not source or not target:
-            logger.warning(f"Skipping edge with missing source or target: {edge}")
-            continue
-        
-        # Initialize sets if they don't exist
-        if target not in relationships["parents"]:
-            relationships["parents"][target] = set()
-        if source not in relationships["children"]:
-            relationships["children"][source] = set()
-        
-        # Update relationships
-        relationships["parents"][target].add(source)
-        relationships["children"][source].add(target)
+    Claude has no local tokenizer in the SDK, so this uses the usual estimate
+    of about four characters per token for English text.
     
-    return relationships
+    Args:
+        text: Text to truncate
+        max_tokens: Approximate token budget
+        
+    Returns:
+        The original text if it fits the budget, otherwise a truncated copy ending in an ellipsis
+    """
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    truncated = text[:max_chars]
+    cut = truncated.rfind(" ")
+    if cut > max_chars // 2:
+        truncated = truncated[:cut]
+    return truncated.rstrip() + "..."
 
 
-def check_children_completed(node_id: str, edges: List[Dict[str, str]], node_statuses: Dict[str, str]) -> Dict[str, Any]:
+def build_node_relationships(edges: Iterable[Tuple[str, str]]) -> Dict[str, Dict[str, Set[str]]]:
     """
-    Check if all children of a node are completed.
+    Build a relationships map from a list of edges.
     
     Args:
-        node_id: The parent node ID
-        edges: List of edge dictionaries with source and target
-        node_statuses: Dictionary mapping node IDs to their statuses
+        edges: Iterable of (source, target) pairs
         
     Returns:
-        Dictionary with completion status and pending children
+        Dictionary with parent and child relationships
     """
-    children = []
-    children_pending = []
-    
-    # Find all child nodes
-    for edge in edges:
-        if edge.get("source") == node_id:
-            children.append(edge.get("target"))
+    parents: DefaultDict[str, Set[str]] = defaultdict(set)  # target -> set of sources
+    children: DefaultDict[str, Set[str]] = defaultdict(set)  # source -> set of targets
     
-    # Check if any children are not completed
-    for child_id in children:
-        child_status = node_statuses.get(child_id)
-        if child_status != "completed":
-            children_pending.append(child_id)
+    for source, target in edges:
+        if not source or not target:
+            logger.warning(f"Skipping edge with missing source or target: {(source, target)}")
+            continue
+        
+        parents[target].add(source)
+        children[source].add(target)
     
-    return {
-        "all_completed": len(children_pending) == 0,
-        "children_pending": children_pending
-    }
+    return {"parents": parents, "children": children}
 
 
-def check_node_unlockable(node_id: str, edges: List[Dict[str, str]], node_statuses: Dict[str, str]) -> Dict[str, Any]:
+def check_node_unlockable(
+    node_id: str,
+    parents_of: Callable[[str], Iterable[str]],
+    status_of: Callable[[str], Optional[str]]
+) -> Dict[str, Any]:
     """
     Check if a node is unlockable based on its parent nodes.
     
     Args:
         node_id: The node ID to check
-        edges: List of edge dictionaries with source and target
-        node_statuses: Dictionary mapping node IDs to their statuses
+        parents_of: Returns the parent IDs of a node
+        status_of: Returns the status of a node, or None if it has none
         
     Returns:
         Dictionary with unlockable status and pending prerequisites
     """
-    # Find all parent nodes
-    parents = []
-    for edge in edges:
-        if edge.get("target") == node_id:
-            parents.append(edge.get("source"))
+    parents = parents_of(node_id)
     
     # If no parents, node is a root and should be unlockable
     if not parents:
         return {"unlockable": True, "prerequisites_pending": []}
     
-    # Check if all parents are completed
-    prerequisites_pending = []
-    for parent_id in parents:
-        parent_status = node_statuses.get(parent_id)
-        if parent_status != "completed":
-            prerequisites_pending.append(parent_id)
+    # Collect incomplete parents in a single pass over the parents
+    pending = [parent_id for parent_id in parents if status_of(parent_id) != "completed"]
     
-    return {
-        "unlockable": len(prerequisites_pending) == 0,
-        "prerequisites_pending": prerequisites_pending
-    } 
\ No newline at end of file
+    return {"unlockable": not pending, "prerequisites_pending": pending}
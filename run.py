@@ -1,6 +1,5 @@
 """Run script for the Mind Map Learning API."""
 import logging
-import importlib
 import os
 import sys
 
@@ -16,7 +15,6 @@ def main():
         
         # Import and run the FastAPI application
         from backend_mindmap.main import main as run_app
-        importlib.reload(sys.modules.get('backend_mindmap.main'))
         
         logger.info("Starting Mind Map Learning API")
         run_app()